@@ -0,0 +1,96 @@
+"""Build time of the Walker alias tables, vectorized against the classic loop,
+the time to build and draw from SimpleSampler and WalkerSampler tables of
+each size, and the rate of single draws with and without a BufferedSampler.
+
+Weights are Zipf like unigram counts of 1e3 up to 10^max-exp items. The loop
+is skipped above 1e7 items, where it takes minutes. Tables of 1e8 items need
+about 4GB of memory. Run from the repository root::
+
+    $ python benchmarks/bench_samplers.py --max-exp 8
+"""
+import os, sys, argparse, time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from datautils.samplers import WalkerSampler, SimpleSampler, BufferedSampler
+from datautils.samplers.walkersampler import aliastables
+
+def looptables(weights):
+    """The alias table loop WalkerSampler used before aliastables."""
+    n = len(weights)
+    weights = weights.copy()
+    inx = -np.ones(n, dtype = int)
+    short = np.where(weights < 1)[0].tolist()
+    long = np.where(weights > 1)[0].tolist()
+    while short and long:
+        j = short.pop()
+        k = long[-1]
+        inx[j] = k
+        weights[k] -= (1 - weights[j])
+        if weights[k] < 1:
+            short.append(k)
+            long.pop()
+    return weights, inx
+
+def unigram_weights(n, seed = 0):
+    counts = np.random.RandomState(seed).zipf(1.3, n).astype(float) ** 0.75
+    return counts * n / counts.sum()
+
+def timed(f, *args):
+    start = time.time()
+    f(*args)
+    return time.time() - start
+
+def simple_vs_walker(max_exp, draws):
+    print('%12s %10s %10s %10s %10s %10s %10s' % ('items', 'walker', 'build', 'simple64', 'simple32', 'sorted32', 'build'))
+    for e in range(3, max_exp + 1):
+        weights = unigram_weights(10 ** e)
+        start = time.time()
+        walker = WalkerSampler(weights, rng = 0)
+        walker_build = time.time() - start
+        start = time.time()
+        simple = SimpleSampler(weights, rng = 0)
+        simple_build = time.time() - start
+        simple32 = SimpleSampler(weights, rng = 0, dtype = np.float32)
+        print('%12d %10.3f %10.3f %10.3f %10.3f %10.3f %10.3f' % (
+            10 ** e, timed(walker.random, draws), walker_build, timed(simple.random, draws),
+            timed(simple32.random, draws), timed(simple32.random_sorted, draws), simple_build))
+
+def single_draws(count = 200000):
+    sampler = WalkerSampler(unigram_weights(10 ** 6), rng = 0)
+    print('%-24s %12s' % ('single draws', 'draws/s'))
+    rows = [('WalkerSampler', sampler),
+            ('BufferedSampler', BufferedSampler(sampler)),
+            ('BufferedSampler (bg)', BufferedSampler(sampler, background = True))]
+    for name, s in rows:
+        draw = s.random
+        start = time.time()
+        for _ in xrange(count):
+            draw()
+        print('%-24s %12.0f' % (name, count / (time.time() - start)))
+        if isinstance(s, BufferedSampler):
+            s.close()
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__.split('\n')[0])
+    parser.add_argument('--max-exp', type = int, default = 7)
+    parser.add_argument('--max-loop-exp', type = int, default = 7)
+    parser.add_argument('--draws', type = int, default = 10 ** 6)
+    args = parser.parse_args()
+    print('%12s %12s %12s %8s' % ('items', 'loop (s)', 'vector (s)', 'speedup'))
+    for e in range(3, args.max_exp + 1):
+        weights = unigram_weights(10 ** e)
+        vector = timed(aliastables, weights)
+        if e <= args.max_loop_exp:
+            loop = timed(looptables, weights)
+            print('%12d %12.3f %12.3f %7.1fx' % (10 ** e, loop, vector, loop / vector))
+        else:
+            print('%12d %12s %12.3f %8s' % (10 ** e, '-', vector, '-'))
+    print('')
+    print('seconds for %d draws, and to build the tables' % args.draws)
+    simple_vs_walker(min(args.max_exp, 7), args.draws)
+    print('')
+    single_draws()
+
+if __name__ == '__main__':
+    main()
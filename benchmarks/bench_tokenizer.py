@@ -0,0 +1,83 @@
+"""Throughput of each tokenizer step, in MB/s of input text.
+
+Every step is timed on two inputs: many short, tweet like strings and a single
+long string made of 100k character runs. The replace_* steps look at each
+string as one token, mostly only at its ends, so their long input rates are
+those of a single comparison and very high. Run from the repository root::
+
+    $ python benchmarks/bench_tokenizer.py
+"""
+import os, sys, random, timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from datautils import tokenizer as tk
+
+SHORT = 'HHHEEYYYY?hellllo @somebody My WONder:-(fulll, www.google.com fri:-)en:-)ds!'
+PLACEHOLDERS = ['<url>', '<smileyface>', '<frownyface>', '<mention>']
+
+def short_input(count = 20000, seed = 0):
+    rng = random.Random(seed)
+    words = SHORT.split(' ')
+    return [' '.join(rng.sample(words, rng.randint(1, len(words)))) for _ in range(count)]
+
+def long_input(runs = 10, runlength = 100000):
+    parts = []
+    for i in range(runs):
+        parts.append('abcdefghij'[i] * runlength)
+        parts.append(' www.google.com :-) hello, my friends! ')
+    return [''.join(parts)]
+
+STEPS = [
+    ('lower_case', tk.lower_case, []),
+    ('rm_dup_letters', tk.rm_dup_letters, []),
+    ('split_ditch_char', tk.split_ditch_char, [' ']),
+    ('split_keep_char', tk.split_keep_char, [' ']),
+    ('split_ditch_func', tk.split_ditch_func, [tk.non_alphanumeric]),
+    ('split_keep_func', tk.split_keep_func, [tk.non_alphanumeric]),
+    ('replace_and_split', tk.replace_and_split, [':-)', '<smileyface>']),
+    ('replace_full_match', tk.replace_full_match, ['hello', '<hello>']),
+    ('replace_partial_match', tk.replace_partial_match, ['.com', '<url>']),
+    ('replace_if_startswith', tk.replace_if_startswith, ['@', '<mention>']),
+    ('replace_if_endswith', tk.replace_if_endswith, ['!', '<bang>']),
+]
+
+def example_tokenizer():
+    t = tk.initialize_tokenizer()
+    tk.add_to_tokenizer(t, tk.lower_case)
+    tk.add_to_tokenizer(t, tk.split_ditch_char, [' '])
+    tk.add_to_tokenizer(t, tk.rm_dup_letters)
+    tk.add_to_tokenizer(t, tk.replace_and_split, [':-)', '<smileyface>'])
+    tk.add_to_tokenizer(t, tk.replace_and_split, [':-(', '<frownyface>'])
+    for url_part in ['http://', '.com', '.net', '.org', 'www.']:
+        tk.add_to_tokenizer(t, tk.replace_partial_match, [url_part, '<url>'])
+    tk.add_to_tokenizer(t, tk.replace_if_startswith, ['@', '<mention>'])
+    tk.add_to_tokenizer(t, tk.split_ditch_func, [tk.non_alphanumeric, PLACEHOLDERS])
+    return t
+
+def throughput(f, docs, repeat = 3, mintime = 0.2):
+    """Best of repeat runs of f(docs), in MB/s. Each run calls f as many
+    times as it takes to last at least mintime seconds, as timeit's
+    autorange does, so fast steps aren't timed at the clock's resolution."""
+    nbytes = sum(len(doc) for doc in docs)
+    timer = timeit.Timer(lambda: f(docs))
+    number = 1
+    while timer.timeit(number) < mintime:
+        number *= 10
+    seconds = min(timer.repeat(repeat, number)) / number
+    return nbytes / seconds / 1e6 if seconds > 0 else float('inf')
+
+def main():
+    inputs = [('short', short_input()), ('long', long_input())]
+    print('%-24s %12s %12s' % ('step (MB/s)', 'short', 'long'))
+    for name, f, args in STEPS:
+        rates = [throughput(lambda docs: f(docs, *args), docs) for _, docs in inputs]
+        print('%-24s %12.2f %12.2f' % tuple([name] + rates))
+    t = example_tokenizer()
+    compiled = tk.compile_tokenizer(t)
+    for name, f in [('tokenize', lambda docs: [tk.tokenize(doc, t) for doc in docs]),
+                    ('compile_tokenizer', lambda docs: [compiled(doc) for doc in docs])]:
+        rates = [throughput(f, docs) for _, docs in inputs]
+        print('%-24s %12.2f %12.2f' % tuple([name] + rates))
+
+if __name__ == '__main__':
+    main()
@@ -1,2 +1,2 @@
 """... automodule::"""
-import representation, tokenizer, samplers, wordembeddings
+import representation, tokenizer, samplers, wordembeddings, storage
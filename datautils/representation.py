@@ -27,7 +27,15 @@
 #	classes for storing vector representation of non vector things
 #---------------------------------------#
 
+from collections import OrderedDict
+from itertools import chain
+from multiprocessing.pool import ThreadPool
 import numpy as np
+try:
+    import scipy.sparse as sp
+except ImportError:
+    sp = None
+from . storage import savearrays, loadarrays, indexdict
 
 def binarray(dim, onesat):
     z = np.zeros(dim)
@@ -46,41 +54,282 @@ def onehotoffsetarray(offsetdim, onehotdim, indices):
     z[offsetdim + onehot] = 1
     return z
 
+def binmatrix(dim, rows, out = None, dtype = np.float32):
+    """Return a len(rows) x dim array with ones at each tuple of indices in rows.
+
+    If out is given it is zeroed and filled in place.
+    """
+    n = len(rows)
+    if out is None:
+        out = np.zeros((n, dim), dtype = dtype)
+    elif out.shape != (n, dim):
+        raise ValueError('out must have shape %r, not %r' % ((n, dim), out.shape))
+    else:
+        out[...] = 0
+    lengths = np.array([len(row) for row in rows], dtype = np.intp)
+    cols = np.fromiter(chain.from_iterable(rows), dtype = np.intp, count = lengths.sum())
+    out[np.repeat(np.arange(n), lengths), cols] = 1
+    return out
+
+def csrarray(dim, rows, dtype = np.float64):
+    """Return a scipy.sparse.csr_matrix with a row of ones at each tuple of
+    indices in rows."""
+    if sp is None:
+        raise ImportError('sparse representations require scipy')
+    indptr = np.zeros(len(rows) + 1, dtype = np.int64)
+    np.cumsum([len(row) for row in rows], out = indptr[1:])
+    indices = np.fromiter(chain.from_iterable(rows), dtype = np.int32, count = indptr[-1])
+    data = np.ones(indptr[-1], dtype = dtype)
+    return sp.csr_matrix((data, indices, indptr), shape = (len(rows), dim))
+
+def indicesrep(dim, indices, sparse = False):
+    """Return a dense array, or a 1 x dim csr_matrix if sparse, with ones at indices."""
+    if sparse:
+        return csrarray(dim, [indices])
+    return binarray(dim, indices)
+
+def densematrix(matrix):
+    """Return matrix as a dense array, converting it if it is sparse."""
+    if sp is not None and sp.issparse(matrix):
+        return matrix.toarray()
+    return np.asarray(matrix)
+
+def densevec(rep):
+    """Return rep, a vector or a 1 x dim sparse row, as a flat dense array."""
+    return densematrix(rep).ravel()
+
 def wheregt(x, t):
     return tuple([i for i in np.where(x > t)[0]])
 
+def argmaxrows(matrix):
+    """Return the column of the largest value in each row of a dense or sparse matrix."""
+    return np.asarray(matrix.argmax(axis = 1)).ravel()
+
+def wheregtrows(matrix, t):
+    """Return, for each row of a dense or sparse matrix, an array of the columns greater than t."""
+    n = matrix.shape[0]
+    if sp is not None and sp.issparse(matrix) and t >= 0:
+        # implicit zeros are never above t, so only the stored values are compared
+        matrix = matrix.tocsr()
+        if not matrix.has_sorted_indices:
+            matrix = matrix.sorted_indices()
+        keep = matrix.data > t
+        rows = np.repeat(np.arange(n), np.diff(matrix.indptr))[keep]
+        cols = matrix.indices[keep]
+    else:
+        rows, cols = np.nonzero(densematrix(matrix) > t)
+    return np.split(cols, rows.searchsorted(np.arange(1, n)))
+
+def packcodes(bits):
+    """Pack the rows of a boolean (n, dim) array into (n, ceil(dim / 64)) uint64 words."""
+    bits = np.asarray(bits, dtype = bool)
+    n, dim = bits.shape
+    nbytes = 8 * ((dim + 63) // 64)
+    packed = np.zeros((n, nbytes), dtype = np.uint8)
+    packed[:, :(dim + 7) // 8] = np.packbits(bits, axis = 1)
+    return packed.view(np.uint64)
+
+def unpackcodes(codes, dim):
+    """Unpack rows of uint64 words made by packcodes into a (n, dim) uint8 array of bits."""
+    codes = np.ascontiguousarray(codes, dtype = np.uint64)
+    return np.unpackbits(codes.view(np.uint8), axis = 1)[:, :dim]
+
+_M1, _M2, _M4 = np.uint64(0x5555555555555555), np.uint64(0x3333333333333333), np.uint64(0x0f0f0f0f0f0f0f0f)
+_H01, _S1, _S2, _S4, _S56 = [np.uint64(i) for i in (0x0101010101010101, 1, 2, 4, 56)]
+
+def _popcount(x, t):
+    """Replace each element of the uint64 array x by its number of set bits,
+    using t as scratch space."""
+    np.right_shift(x, _S1, out = t)
+    t &= _M1
+    x -= t
+    np.right_shift(x, _S2, out = t)
+    t &= _M2
+    x &= _M2
+    x += t
+    np.right_shift(x, _S4, out = t)
+    x += t
+    x &= _M4
+    x *= _H01
+    x >>= _S56
+    return x
+
+def popcount(x):
+    """Return the number of set bits in each element of a uint64 array."""
+    x = np.array(x, dtype = np.uint64)
+    return _popcount(x, np.empty_like(x))
+
+def hammingdist(queries, codes, chunk = 1 << 16):
+    """Return the (len(queries), len(codes)) int32 Hamming distances between
+    two arrays of codes packed by packcodes.
+
+    Codes are compared chunk distances at a time so temporaries stay in cache.
+    """
+    queries = np.asarray(queries, dtype = np.uint64)
+    codes = np.asarray(codes, dtype = np.uint64)
+    dist = np.zeros((len(queries), len(codes)), dtype = np.int32)
+    step = max(1, chunk // max(1, len(queries)))
+    x = np.empty((len(queries), min(step, len(codes))), dtype = np.uint64)
+    t = np.empty_like(x)
+    for start in range(0, len(codes), step):
+        block = codes[start:start + step]
+        xs, ts, ds = x[:, :len(block)], t[:, :len(block)], dist[:, start:start + step]
+        for j in range(codes.shape[1]):
+            np.bitwise_xor(queries[:, j:j + 1], block[:, j], out = xs)
+            np.add(ds, _popcount(xs, ts), out = ds, casting = 'unsafe')
+    return dist
+
+def hammingknn(queries, codes, k = 1, workers = 1, blocksize = 1 << 22):
+    """Return the rows of codes nearest each row of queries in Hamming distance.
+
+    Both are packed as by packcodes. Queries are searched in blocks of about
+    blocksize distances, spread over workers threads (numpy releases the GIL).
+    Returns indices and distances as two (len(queries), k) arrays, nearest
+    first, ties broken by lower index.
+    """
+    queries = np.asarray(queries, dtype = np.uint64)
+    k = min(k, len(codes))
+    rows = max(1, blocksize // max(1, len(codes)))
+
+    def search(start):
+        dist = hammingdist(queries[start:start + rows], codes)
+        if k == 1:
+            idx = dist.argmin(axis = 1)[:, None]
+        else:
+            # keys order by distance then index and are unique, so the
+            # partition can't split ties at the k-th distance arbitrarily
+            key = dist.astype(np.int64) * len(codes) + np.arange(len(codes))
+            if k < len(codes):
+                idx = np.argpartition(key, k - 1, axis = 1)[:, :k]
+            else:
+                idx = np.tile(np.arange(len(codes)), (len(dist), 1))
+            order = np.take_along_axis(key, idx, 1).argsort(axis = 1)
+            idx = np.take_along_axis(idx, order, 1)
+        return idx, np.take_along_axis(dist, idx, 1)
+
+    starts = range(0, len(queries), rows)
+    if workers > 1 and len(starts) > 1:
+        pool = ThreadPool(workers)
+        try:
+            results = pool.map(search, starts)
+        finally:
+            pool.close()
+    else:
+        results = [search(start) for start in starts]
+    if not results:
+        return np.zeros((0, k), dtype = np.intp), np.zeros((0, k), dtype = np.int32)
+    return np.vstack([idx for idx, dist in results]), np.vstack([dist for idx, dist in results])
+
+def nbytesof(x):
+    """Return the bytes used by the array data of a numpy array or sparse matrix."""
+    try:
+        return x.nbytes
+    except AttributeError:
+        return x.data.nbytes + x.indices.nbytes + x.indptr.nbytes
+
+class RepCache(object):
+    """Cache of item representations with least recently used eviction.
+
+    By default the cache is unbounded. maxitems and maxbytes bound the number of
+    entries and the bytes of array data they hold, and maxitems = 0 turns
+    caching off. hits, misses and evictions count lookups and evicted entries.
+    """
+    def __init__(self, maxitems = None, maxbytes = None):
+        self.maxitems = maxitems
+        self.maxbytes = maxbytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getitem__(self, key):
+        try:
+            if self.maxitems is None and self.maxbytes is None:
+                value = self.entries[key]
+            else:
+                value = self.entries.pop(key)
+                self.entries[key] = value
+        except KeyError:
+            self.misses += 1
+            raise
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        nbytes = nbytesof(value)
+        if self.maxitems == 0 or (self.maxbytes is not None and nbytes > self.maxbytes):
+            return
+        if key in self.entries:
+            self.nbytes -= nbytesof(self.entries.pop(key))
+        self.entries[key] = value
+        self.nbytes += nbytes
+        while ((self.maxitems is not None and len(self.entries) > self.maxitems) or
+               (self.maxbytes is not None and self.nbytes > self.maxbytes)):
+            self.nbytes -= nbytesof(self.entries.popitem(last = False)[1])
+            self.evictions += 1
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+    def stats(self):
+        return {'entries': len(self.entries), 'nbytes': self.nbytes, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions}
+
 class IntRep(object):
+    """Maps items to integer indices, 0 being reserved for unknown items.
+
+    Counts are kept in a growable int64 array and items in a list by index.
+    """
     def __init__(self, vocab = None, notfound = '<UNK?>'):
         self.notfound = notfound
         self.item_to_idx = {notfound: 0}
-        self.idx_to_item = {0: notfound}
-        self.idx_ctr = {0: 0}
+        self.idx_to_item = [notfound]
+        self._counts = np.zeros(16, dtype = np.int64)
         self.dim = 1
-        if vocab:
-            for word in vocab:
-                try:
-                    i = self.item_to_idx[word]
-                    self.idx_ctr[i] += 1
-                except KeyError:
-                    self.item_to_idx[word] = self.dim
-                    self.idx_to_item[self.dim] = word
-                    self.idx_ctr[self.dim] = 1
-                    self.dim += 1
-    
+        if vocab is not None:
+            self.add_many(vocab)
+
+    @property
+    def counts(self):
+        """How often each index was added, as an array of length dim."""
+        return self._counts[:self.dim]
+
+    def __len__(self):
+        return self.dim
+
+    def __contains__(self, word):
+        return word in self.item_to_idx
+
     def __getitem__(self, word):
-        try:
-            return self.item_to_idx[word]
-        except KeyError:
-            return 0
+        return self.item_to_idx.get(word, 0)
 
     def inv(self, val):
         try:
-            return self.idx_to_item[val]
-        except:
-            return self.notfound
+            if val >= 0:
+                return self.idx_to_item[val]
+        except (IndexError, TypeError):
+            pass
+        return self.notfound
 
     def topk(self, k = None, get_item = False):
-        s = sorted(self.idx_ctr.iteritems(), key = lambda x: x[1], reverse = True)[:k]
+        counts = self.counts
+        if k is None or k < 0 or k >= self.dim:
+            top = np.argsort(-counts, kind = 'mergesort')[:k]
+        else:
+            # everything counted at least as often as the kth most frequent
+            # item, ordered by count and then index like a stable sort
+            kth = np.partition(counts, self.dim - k)[self.dim - k] if k else counts.max() + 1
+            top = np.flatnonzero(counts >= kth)
+            top = top[np.lexsort((top, -counts[top]))][:k]
+        s = list(zip(top.tolist(), counts[top].tolist()))
         if get_item:
             return [(self.inv(idx), count) for idx, count in s][:k]
         return s[:k]
@@ -88,80 +337,217 @@ class IntRep(object):
     def add(self, word):
         try:
             i = self.item_to_idx[word]
-            self.idx_ctr[i] += 1
         except KeyError:
-            self.item_to_idx[word] = self.dim
-            self.idx_to_item[self.dim] = word
-            self.idx_ctr[self.dim] = 1
+            i = self.item_to_idx[word] = self.dim
+            self.idx_to_item.append(word)
             self.dim += 1
-    
+            self._reserve(self.dim)
+        self._counts[i] += 1
+
+    def add_many(self, words):
+        """Add every word in words, returning their indices as an int32 array.
+
+        New words are indexed in order of first occurrence and all counts are
+        updated with a single bincount.
+        """
+        item_to_idx = self.item_to_idx
+        idx_to_item = self.idx_to_item
+        ids = []
+        append = ids.append
+        for word in words:
+            try:
+                append(item_to_idx[word])
+            except KeyError:
+                i = item_to_idx[word] = len(idx_to_item)
+                idx_to_item.append(word)
+                append(i)
+        self.dim = len(idx_to_item)
+        self._reserve(self.dim)
+        ids = np.array(ids, dtype = np.int32)
+        self._counts[:self.dim] += np.bincount(ids, minlength = self.dim)
+        return ids
+
+    def encode(self, words):
+        """Return the indices of words as an int32 array, 0 for unknown words."""
+        get = self.item_to_idx.get
+        return np.array([get(word, 0) for word in words], dtype = np.int32)
+
+    def encode_batch(self, words, out = None, dtype = np.int32):
+        """Like encode, filling out if given."""
+        get = self.item_to_idx.get
+        if out is None:
+            return np.array([get(word, 0) for word in words], dtype = dtype)
+        out[...] = [get(word, 0) for word in words]
+        return out
+
+    def decode(self, ids):
+        """Return the words at ids, notfound for ids out of range."""
+        ids = np.asarray(ids)
+        ids = np.where((ids >= 0) & (ids < self.dim), ids, 0)
+        idx_to_item = self.idx_to_item
+        return [idx_to_item[i] for i in ids.ravel().tolist()]
+
+    def prune(self, min_count = None, max_size = None):
+        """Return a re-indexed copy without rare items, and an int32 array
+        mapping each old index to its new one.
+
+        Items counted fewer than min_count times are dropped, then the least
+        frequent are dropped until at most max_size indices (including the
+        unknown index 0) remain. Dropped items map to 0 and their counts are
+        added to the count of 0, so the remap can be applied to data encoded
+        with this IntRep.
+        """
+        counts = self.counts
+        keep = np.ones(self.dim, dtype = bool)
+        if min_count is not None:
+            keep &= counts >= min_count
+        keep[0] = True
+        if max_size is not None and keep.sum() > max_size:
+            kept = np.flatnonzero(keep[1:]) + 1
+            kept = kept[np.lexsort((kept, -counts[kept]))][:max(max_size - 1, 0)]
+            keep[1:] = False
+            keep[kept] = True
+        idx = np.flatnonzero(keep)
+        remap = np.where(keep, np.cumsum(keep) - 1, 0).astype(np.int32)
+        pruned = IntRep(notfound = self.notfound)
+        pruned.idx_to_item = [self.idx_to_item[i] for i in idx.tolist()]
+        pruned.item_to_idx = dict(zip(pruned.idx_to_item, range(len(idx))))
+        pruned.dim = len(idx)
+        pruned._counts = counts[idx].copy()
+        pruned._counts[0] += counts[~keep].sum()
+        return pruned, remap
+
+    def save(self, path):
+        """Save items and counts to the directory path, see storage."""
+        savearrays(path, 'IntRep', {}, {'counts': self.counts}, self.idx_to_item)
+
+    @classmethod
+    def load(cls, path, mmap = True):
+        """Load an IntRep saved to path, memory mapping its counts copy on
+        write if mmap."""
+        meta, arrays, items = loadarrays(path, 'IntRep', mmap, ['counts'])
+        rep = cls(notfound = items[0])
+        rep.idx_to_item = items
+        rep.item_to_idx = indexdict(items)
+        rep._counts = arrays['counts']
+        rep.dim = len(items)
+        return rep
+
+    def _reserve(self, dim):
+        """Make room in the count array for dim indices."""
+        if dim > len(self._counts):
+            counts = np.zeros(max(dim, 2 * len(self._counts)), dtype = np.int64)
+            counts[:len(self._counts)] = self._counts
+            self._counts = counts
+
 class OneHotRep(object):
-    def __init__(self, vocab = None, notfound = '<UNK?>'):
+    def __init__(self, vocab = None, notfound = '<UNK?>', sparse = False, cache = None):
         self.item_to_idx = {notfound: 0}
         self.idx_to_item = {0: notfound}
-        self.item_to_rep = {}
+        self.item_to_rep = cache if cache is not None else RepCache()
         self.dim = 1
         self.notfound = notfound
+        self.sparse = sparse
         if vocab:
-            self.dim += len(vocab)
-            self.item_to_idx = dict([(item, i) for i, item in enumerate(vocab)])
-            self.idx_to_item = dict([(i, item) for i, item in enumerate(vocab)])
+            for item in vocab:
+                self.add(item)
 
     def __getitem__(self, x):
+        if x not in self.item_to_idx:
+            x = self.notfound
         try:
             return self.item_to_rep[x]
         except KeyError:
-            try:
-                idx = self.item_to_idx[x]
-            except KeyError:
-                idx = self.item_to_idx[self.notfound]
-            z = onehotarray(self.dim, idx)
+            z = indicesrep(self.dim, self.indices(x), self.sparse)
             self.item_to_rep[x] = z
             return z
 
+    def indices(self, x):
+        return (self.item_to_idx.get(x, 0),)
+
+    def sparse_batch(self, items, dtype = np.float64):
+        return csrarray(self.dim, [self.indices(item) for item in items], dtype)
+
+    def encode_batch(self, items, out = None, dtype = np.float32):
+        return binmatrix(self.dim, [self.indices(item) for item in items], out, dtype)
+
     def add(self, item):
-        self.item_to_idx[item] = self.dim
-        self.idx_to_item[self.dim] = item
-        self.dim += 1
+        if item not in self.item_to_idx:
+            self.item_to_idx[item] = self.dim
+            self.idx_to_item[self.dim] = item
+            self.dim += 1
 
     def bagrep(self, items):
-        z = np.zeros(self.n)
-        z[[self[item] for item in items]] = 1
+        z = np.zeros(self.dim)
+        z[[self.indices(item)[0] for item in items]] = 1
         return z
 
     def bagfrom(self, rep, thresh = 0.):
-        return [self.idx_to_item[idx] for idx in wheregt(rep, thresh)]
+        return [self.idx_to_item[idx] for idx in wheregt(densevec(rep), thresh)]
+
+    def bagfrom_batch(self, matrix, thresh = 0.):
+        idx_to_item = self.idx_to_item
+        return [[idx_to_item[idx] for idx in cols.tolist()] for cols in wheregtrows(matrix, thresh)]
 
     def itemfrom(self, rep):
-        return self.idx_to_item[rep.argmax()]
+        return self.idx_to_item[densevec(rep).argmax()]
+
+    def itemfrom_batch(self, matrix):
+        idx_to_item = self.idx_to_item
+        return [idx_to_item[idx] for idx in argmaxrows(matrix).tolist()]
+
+    def save(self, path):
+        """Save items and settings to the directory path, see storage."""
+        items = [self.idx_to_item[i] for i in range(self.dim)]
+        savearrays(path, 'OneHotRep', {'sparse': self.sparse}, {}, items)
+
+    @classmethod
+    def load(cls, path, mmap = True, cache = None):
+        """Load a OneHotRep saved to path."""
+        meta, arrays, items = loadarrays(path, 'OneHotRep', mmap)
+        rep = cls(notfound = items[0], sparse = meta['sparse'], cache = cache)
+        rep.idx_to_item = dict(enumerate(items))
+        rep.item_to_idx = indexdict(items)
+        rep.dim = len(items)
+        return rep
 
 class OneHotOffsetRep(object):
-    def __init__(self, offsetdim, onehotdim, vocab = None, notfound = '<UNK?>'):
+    def __init__(self, offsetdim, onehotdim, vocab = None, notfound = '<UNK?>', sparse = False, cache = None):
         self.onehotdim = onehotdim
         self.offsetdim = offsetdim
+        self.dim = offsetdim + onehotdim
         self.notfound = notfound
+        self.sparse = sparse
         self.curroffset = 0
         self.curronehot = 1
         notfoundidx = (0, 0)
         self.item_to_idx = {notfound: notfoundidx}
         self.idx_to_item = {notfoundidx: notfound}
-        self.item_to_rep = {notfound: onehotoffsetarray(self.offsetdim, self.onehotdim, notfoundidx)}
+        self.item_to_rep = cache if cache is not None else RepCache()
         if vocab:
             for item in vocab:
                 self.add(item)
 
     def __getitem__(self, x):
+        if x not in self.item_to_idx:
+            x = self.notfound
         try:
             return self.item_to_rep[x]
         except KeyError:
-            try:
-                idx = self.item_to_idx[x]
-            except KeyError:
-                return self.item_to_rep[self.notfound]
-            z = onehotoffsetarray(self.offsetdim, self.onehotdim, idx)
+            z = indicesrep(self.dim, self.indices(x), self.sparse)
             self.item_to_rep[x] = z
             return z
 
+    def indices(self, x):
+        offset, onehot = self.item_to_idx.get(x, (0, 0))
+        return (offset, self.offsetdim + onehot)
+
+    def sparse_batch(self, items, dtype = np.float64):
+        return csrarray(self.dim, [self.indices(item) for item in items], dtype)
+
+    def encode_batch(self, items, out = None, dtype = np.float32):
+        return binmatrix(self.dim, [self.indices(item) for item in items], out, dtype)
+
     def __newidx(self):
         if self.curronehot % self.onehotdim == 0:
             self.curronehot = 1
@@ -181,6 +567,7 @@ class OneHotOffsetRep(object):
             self.idx_to_item[idx] = item
     
     def itemfrom(self, rep, thresh = 0.):
+        rep = densevec(rep)
         try:
             offsetidx = rep[:self.offsetdim].argmax()
             onehotidx = rep[self.offsetdim:].argmax()
@@ -189,60 +576,277 @@ class OneHotOffsetRep(object):
             pass
         return '__ITEM_NOT_FOUND__'
 
+    def itemfrom_batch(self, matrix):
+        offsets = argmaxrows(matrix[:, :self.offsetdim]).tolist()
+        onehots = argmaxrows(matrix[:, self.offsetdim:]).tolist()
+        get = self.idx_to_item.get
+        return [get(idx, '__ITEM_NOT_FOUND__') for idx in zip(offsets, onehots)]
+
+    def save(self, path):
+        """Save items, their indices and settings to the directory path, see
+        storage."""
+        items = [self.notfound] + [item for item in self.item_to_idx if item != self.notfound]
+        idx = np.array([self.item_to_idx[item] for item in items], dtype = np.int64)
+        meta = {'offsetdim': self.offsetdim, 'onehotdim': self.onehotdim, 'sparse': self.sparse,
+                'curroffset': self.curroffset, 'curronehot': self.curronehot}
+        savearrays(path, 'OneHotOffsetRep', meta, {'indices': idx.reshape(-1, 2)}, items)
+
+    @classmethod
+    def load(cls, path, mmap = True, cache = None):
+        """Load a OneHotOffsetRep saved to path."""
+        meta, arrays, items = loadarrays(path, 'OneHotOffsetRep', mmap)
+        rep = cls(meta['offsetdim'], meta['onehotdim'], notfound = items[0], sparse = meta['sparse'], cache = cache)
+        idx = [tuple(i) for i in arrays['indices'].tolist()]
+        rep.item_to_idx = dict(zip(items, idx))
+        rep.idx_to_item = dict(zip(idx, items))
+        rep.curroffset, rep.curronehot = meta['curroffset'], meta['curronehot']
+        return rep
+
 
 class RandBinRep(object):
-    def __init__(self, dim, vocab = None, p = 0.1, notfound = '<UNK?>'):
+    """Random binary codes, each bit set with probability p, one per item.
+
+    Codes are unique and stored bit packed, row i of codes being the code of
+    the item at index i, so decoding a vector is a Hamming distance nearest
+    neighbour search over codes.
+    """
+    def __init__(self, dim, vocab = None, p = 0.1, notfound = '<UNK?>', sparse = False, cache = None):
         self.dim = dim
         self.q = 1 - p
         self.notfound = notfound
-        notfoundidx = wheregt(np.random.random(self.dim), self.q)
-        self.item_to_idx = {notfound: notfoundidx}
-        self.idx_to_item = {notfoundidx: notfound}
-        self.item_to_rep = {notfound: binarray(dim, notfoundidx)}
+        self.sparse = sparse
+        self.nwords = (dim + 63) // 64
+        self.item_to_idx = {}
+        self.idx_to_item = []
+        self.code_to_idx = {}
+        self._codes = np.zeros((16, self.nwords), dtype = np.uint64)
+        self.item_to_rep = cache if cache is not None else RepCache()
+        self.add(notfound)
         if vocab:
-            for item in vocab:
-                idx = self.__newidx()
-                self.item_to_idx[item] = idx
-                self.idx_to_item[idx] = item
+            self.add_many(vocab)
+
+    @property
+    def codes(self):
+        """The packed codes, as an array of shape (number of items, nwords)."""
+        return self._codes[:len(self.idx_to_item)]
 
     def __getitem__(self, x):
+        if x not in self.item_to_idx:
+            x = self.notfound
         try:
             return self.item_to_rep[x]
         except KeyError:
-            try:
-                idx = self.item_to_idx[x]
-            except KeyError:
-                return self.item_to_rep[self.notfound]
-            z = binarray(self.dim, idx)
+            z = indicesrep(self.dim, self.indices(x), self.sparse)
             self.item_to_rep[x] = z
             return z
 
-    def __newidx(self):
-        idx = wheregt(np.random.random(self.dim), self.q)
-        patience = 1000
-        while idx in self.idx_to_item and patience > 0:
-            idx = wheregt(np.random.random(self.dim), self.q)
-            patience -= 1
-        if patience < 0:
-            return ()
-        return idx
+    def indices(self, x):
+        i = self.item_to_idx.get(x, 0)
+        return tuple(np.flatnonzero(unpackcodes(self._codes[i:i + 1], self.dim)[0]).tolist())
+
+    def sparse_batch(self, items, dtype = np.float64):
+        return csrarray(self.dim, [self.indices(item) for item in items], dtype)
+
+    def encode_batch(self, items, out = None, dtype = np.float32):
+        get = self.item_to_idx.get
+        bits = unpackcodes(self._codes[[get(item, 0) for item in items]], self.dim)
+        if out is None:
+            return bits.astype(dtype)
+        out[...] = bits
+        return out
 
     def add(self, item):
-        try:
-            self.item_to_idx[item]
-        except KeyError:
-            idx = self.__newidx()
-            self.item_to_idx[item] = idx
-            self.idx_to_item[idx] = item
+        self.add_many([item])
+
+    def add_many(self, items, patience = 1000):
+        """Give every new item in items a code not used by any other item."""
+        new = []
+        for item in items:
+            if item not in self.item_to_idx:
+                self.item_to_idx[item] = len(self.idx_to_item)
+                self.idx_to_item.append(item)
+                new.append(item)
+        n, start = len(self.idx_to_item), len(self.idx_to_item) - len(new)
+        if n > len(self._codes):
+            codes = np.zeros((max(n, 2 * len(self._codes)), self.nwords), dtype = np.uint64)
+            codes[:start] = self._codes[:start]
+            self._codes = codes
+        todo = np.arange(start, n)
+        while len(todo) > 0:
+            if patience < 0:
+                for i in range(start, n):
+                    key = self._codes[i].tobytes()
+                    if self.code_to_idx.get(key) == i:
+                        del self.code_to_idx[key]
+                    del self.item_to_idx[self.idx_to_item[i]]
+                del self.idx_to_item[start:]
+                raise ValueError('could not find unused codes, increase dim or p')
+            patience -= 1
+            collided = []
+            for block in range(0, len(todo), 4096):
+                rows = todo[block:block + 4096]
+                self._codes[rows] = packcodes(np.random.random((len(rows), self.dim)) > self.q)
+                for i, code in zip(rows.tolist(), self._codes[rows]):
+                    key = code.tobytes()
+                    if key in self.code_to_idx:
+                        collided.append(i)
+                    else:
+                        self.code_to_idx[key] = i
+            todo = np.array(collided, dtype = np.intp)
     
-    def itemfrom(self, rep, thresh = 0.):
+    def itemfrom(self, rep, thresh = 0., nearest = True):
+        code = packcodes(densevec(rep)[None] > thresh)
         try:
-            return self.idx_to_item[wheregt(rep, thresh)]
+            return self.idx_to_item[self.code_to_idx[code.tobytes()]]
         except KeyError:
             pass
+        if nearest:
+            return self.idx_to_item[self.knn(code)[0][0, 0]]
         return '__ITEM_NOT_FOUND__'
 
+    def itemfrom_batch(self, matrix, thresh = 0., nearest = True, workers = 1):
+        """Decode each row of matrix to the item whose code is nearest in
+        Hamming distance to the row thresholded at thresh. If nearest is False,
+        rows not matching a code exactly give '__ITEM_NOT_FOUND__'."""
+        codes = packcodes(densematrix(matrix) > thresh)
+        get = self.code_to_idx.get
+        idx = np.array([get(code.tobytes(), -1) for code in codes], dtype = np.intp)
+        missing = np.flatnonzero(idx < 0)
+        if nearest and len(missing):
+            idx[missing] = self.knn(codes[missing], workers = workers)[0][:, 0]
+        return [self.idx_to_item[i] if i >= 0 else '__ITEM_NOT_FOUND__' for i in idx.tolist()]
+
+    def knn(self, codes, k = 1, workers = 1):
+        """Return the indices and Hamming distances of the k items with codes
+        nearest to each row of the packed codes, as two (len(codes), k) arrays."""
+        return hammingknn(codes, self.codes, k, workers)
+
+    def similar(self, item, k = 10):
+        """Return the k items with codes nearest the code of item, with their
+        Hamming distances, excluding item itself."""
+        i = self.item_to_idx.get(item, 0)
+        idx, dist = self.knn(self._codes[i:i + 1], k + 1)
+        return [(self.idx_to_item[j], d) for j, d in zip(idx[0].tolist(), dist[0].tolist()) if j != i][:k]
+
+    def save(self, path):
+        """Save items, their packed codes and settings to the directory path,
+        see storage."""
+        meta = {'dim': self.dim, 'p': 1 - self.q, 'sparse': self.sparse}
+        savearrays(path, 'RandBinRep', meta, {'codes': self.codes}, self.idx_to_item)
+
+    @classmethod
+    def load(cls, path, mmap = True, cache = None):
+        """Load a RandBinRep saved to path, memory mapping its codes copy on
+        write if mmap."""
+        meta, arrays, items = loadarrays(path, 'RandBinRep', mmap, ['codes'])
+        rep = cls(meta['dim'], p = meta['p'], notfound = items[0], sparse = meta['sparse'], cache = cache)
+        codes = arrays['codes']
+        data, width = codes.tobytes(), 8 * rep.nwords
+        rep.idx_to_item = items
+        rep.item_to_idx = indexdict(items)
+        rep.code_to_idx = indexdict(data[i:i + width] for i in range(0, len(data), width))
+        rep._codes = codes
+        return rep
+
+def huffmantree(counts):
+    """Return the parent and side arrays of a Huffman tree with a leaf per count.
+
+    Nodes 0 to n - 1 are the leaves, n to 2n - 2 the internal nodes in order of
+    creation, the last being the root. side is 1 for nodes that are the right
+    child of their parent. Equal counts give a balanced tree.
+    """
+    counts = np.asarray(counts, dtype = np.float64)
+    n = len(counts)
+    parent = np.zeros(max(2 * n - 1, 1), dtype = np.intp)
+    side = np.zeros(max(2 * n - 1, 1), dtype = np.int8)
+    # leaves sorted by count and internal nodes, which are created in order of
+    # increasing weight, form two sorted queues to take the lightest two from
+    leaves = np.argsort(counts, kind = 'mergesort').tolist()
+    weight = counts.tolist() + [0.] * (n - 1)
+    i, j = 0, n
+    for k in range(n, 2 * n - 1):
+        pair = []
+        for _ in range(2):
+            if i < n and (j >= k or weight[leaves[i]] <= weight[j]):
+                pair.append(leaves[i])
+                i += 1
+            else:
+                pair.append(j)
+                j += 1
+        left, right = pair
+        parent[left] = parent[right] = k
+        side[right] = 1
+        weight[k] = weight[left] + weight[right]
+    return parent, side
 
 class BinaryTreeSoftmaxRep(object):
-    def __init__(self, n):
+    """Hierarchical softmax codes for n items, the leaves of a binary tree.
+
+    The path of an item is the internal nodes, numbered 0 to n - 2, from the
+    root down to its leaf, and its code the branches taken, 1 for right. nodes
+    and codes hold them as (n, depth) arrays, padded with 0 past lengths; mask
+    marks the entries in use. With counts the tree is a Huffman tree, giving
+    frequent items short paths, otherwise it is balanced.
+    """
+    def __init__(self, n, counts = None):
         self.n = n
+        if counts is None:
+            counts = np.ones(n)
+        elif len(counts) != n:
+            raise ValueError('expected %d counts, got %d' % (n, len(counts)))
+        parent, side = huffmantree(counts)
+        root = 2 * n - 2
+        self.lengths = np.zeros(n, dtype = np.intp)
+        levels = []
+        leaves = np.arange(n)
+        cur = leaves
+        while len(leaves):
+            up = cur != root
+            leaves, cur = leaves[up], cur[up]
+            levels.append((leaves, parent[cur] - n, side[cur]))
+            self.lengths[leaves] += 1
+            cur = parent[cur]
+        self.depth = int(self.lengths.max()) if n else 0
+        self.nodes = np.zeros((n, self.depth), dtype = np.int32)
+        self.codes = np.zeros((n, self.depth), dtype = np.int8)
+        for level, (leaves, nodes, codes) in enumerate(levels):
+            pos = self.lengths[leaves] - 1 - level
+            self.nodes[leaves, pos] = nodes
+            self.codes[leaves, pos] = codes
+        self.mask = np.arange(self.depth)[None, :] < self.lengths[:, None]
+
+    @classmethod
+    def fromintrep(cls, intrep):
+        """Build a Huffman tree over the indices of an IntRep, from its counts."""
+        return cls(intrep.dim, intrep.counts)
+
+    def __getitem__(self, idx):
+        length = self.lengths[idx]
+        return self.nodes[idx, :length], self.codes[idx, :length]
+
+    def paths(self, ids):
+        """Return the padded nodes, codes and mask of each index in ids."""
+        ids = np.asarray(ids)
+        return self.nodes[ids], self.codes[ids], self.mask[ids]
+
+    def pathlogprob(self, ids, pathscores):
+        """Return the log probability of each index in ids, given the scores of
+        the nodes on its path, a (len(ids), depth) array aligned with paths(ids).
+
+        The probability of taking the right branch at a node is sigmoid(score).
+        """
+        nodes, codes, mask = self.paths(ids)
+        sign = 2. * codes - 1.
+        return -(np.logaddexp(0., -sign * pathscores) * mask).sum(axis = -1)
+
+    def logprob(self, ids, scores):
+        """Return the log probability of each index in ids, given scores for all
+        n - 1 internal nodes, either shared (a vector) or one row per id."""
+        ids = np.asarray(ids)
+        scores = np.asarray(scores)
+        nodes = self.nodes[ids]
+        if scores.ndim == 1:
+            pathscores = scores[nodes]
+        else:
+            pathscores = np.take_along_axis(scores, nodes, -1)
+        return self.pathlogprob(ids, pathscores)
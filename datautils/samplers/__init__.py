@@ -1,3 +1,6 @@
 """... automodule::"""
 from walkersampler import WalkerSampler
 from simplesampler import SimpleSampler
+from dynamicsampler import DynamicSampler
+from bufferedsampler import BufferedSampler
+from batchedsampler import BatchedSampler
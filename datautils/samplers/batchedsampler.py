@@ -0,0 +1,46 @@
+from numpy import array, asarray, ndarray, where, zeros
+from common import Spawnable, makerng, uniform, integers
+from walkersampler import aliastables
+
+class BatchedSampler(Spawnable):
+    """Walker's alias method for many distributions at once.
+
+    The alias tables of all distributions are stacked in two ``(d, n)`` arrays
+    ``prob`` and ``inx``, shorter weight vectors being padded with zero
+    weights, so `random()` draws from a vector of distribution ids with a
+    single vectorized lookup.
+    """
+
+    def __init__(self, weights, keys=None, rng=None):
+        """Builds the stacked tables from ``weights``, a ``(d, n)`` array or a
+        sequence of ``d`` weight vectors, each in any order and not necessarily
+        summing to 1. ``keys``, if given, are shared by all distributions."""
+        self.rng = makerng(rng)
+        self.keys = None if keys is None else array(keys)
+        if isinstance(weights, ndarray) and weights.ndim == 2:
+            rows = weights.astype(float)
+        else:
+            weights = [asarray(w, dtype=float).ravel() for w in weights]
+            rows = zeros((len(weights), max(len(w) for w in weights)))
+            for row, w in zip(rows, weights):
+                row[:len(w)] = w
+        if (rows < 0).any() or (rows.sum(axis=1) <= 0).any():
+            raise ValueError("each distribution needs non-negative weights with a positive sum")
+        self.d, self.n = rows.shape
+        self.prob = zeros(rows.shape)
+        self.inx = zeros(rows.shape, dtype=int)
+        for i, row in enumerate(rows):
+            self.prob[i], self.inx[i] = aliastables(row * self.n / row.sum())
+
+    def random(self, ids, count=None):
+        """Returns a random integer or key from each distribution in ``ids``,
+        an array of distribution ids, or ``count`` of them per id as an array
+        of shape ``ids.shape + (count,)``."""
+        ids = asarray(ids)
+        if count is not None:
+            ids = ids[..., None].repeat(count, axis=-1)
+        u = uniform(self.rng, ids.shape)
+        j = integers(self.rng, self.n, ids.shape)
+        # strict comparison, so padding of zero weight is never drawn
+        k = where(u < self.prob[ids, j], j, self.inx[ids, j])
+        return self.keys[k] if self.keys is not None else k
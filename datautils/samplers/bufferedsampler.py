@@ -0,0 +1,106 @@
+import threading
+from Queue import Queue, Full
+
+class BufferedSampler(object):
+    """Serves single draws of a sampler from pre-generated blocks.
+
+    Each block is drawn with one vectorized ``sampler.random(blocksize)`` call
+    and converted to a list, so a single `random()` costs about one list
+    iteration instead of several NumPy scalar operations. With ``background``
+    the next block is drawn on a thread while the current one is served, and
+    an error raised there is raised again by the `random()` that needs the
+    block.
+
+    `update()` and `update_many()` pass through to the wrapped sampler (such as
+    a `DynamicSampler`) and discard every block drawn before them, so draws
+    always follow the current weights. Single draws are meant for one consumer
+    thread; use `spawn()` on the wrapped sampler for more.
+    """
+
+    def __init__(self, sampler, blocksize=1 << 16, background=False):
+        self.sampler = sampler
+        self.blocksize = blocksize
+        self.generation = 0
+        self.lock = threading.Lock()
+        self._draws = iter(())
+        self._queue = self._thread = None
+        if background:
+            self._queue = Queue(1)
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._produce)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _draw(self):
+        with self.lock:
+            return self.generation, self.sampler.random(self.blocksize).tolist()
+
+    def _produce(self):
+        while not self._stop.is_set():
+            try:
+                generation, block = self._draw()
+                error = None
+            except Exception as e:
+                # handed to the consumer, which would otherwise wait forever
+                generation, block, error = None, None, e
+            while not self._stop.is_set():
+                try:
+                    self._queue.put((generation, block, error), timeout=0.1)
+                    break
+                except Full:
+                    pass
+            if error is not None:
+                return
+
+    def _refill(self):
+        if self._queue is None:
+            return self._draw()[1]
+        while True:
+            generation, block, error = self._queue.get()
+            if error is not None:
+                # the producer has stopped, so later blocks are drawn here
+                self._thread.join()
+                self._queue = self._thread = None
+                raise error
+            if generation == self.generation:
+                return block
+
+    def random(self, count=None):
+        """Returns a single draw from the current block when `count` is
+        ``None``, otherwise ``sampler.random(count)``."""
+        if count is None:
+            try:
+                return next(self._draws)
+            except StopIteration:
+                self._draws = iter(self._refill())
+                return next(self._draws)
+        with self.lock:
+            return self.sampler.random(count)
+
+    def update(self, *args, **kwargs):
+        """Calls ``sampler.update`` and discards the buffered draws."""
+        with self.lock:
+            self.sampler.update(*args, **kwargs)
+            self.generation += 1
+        self._draws = iter(())
+
+    def update_many(self, *args, **kwargs):
+        """Calls ``sampler.update_many`` and discards the buffered draws."""
+        with self.lock:
+            self.sampler.update_many(*args, **kwargs)
+            self.generation += 1
+        self._draws = iter(())
+
+    def close(self):
+        """Stops the background thread, if any; later blocks are drawn on the
+        calling thread."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._queue = self._thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,164 @@
+"""Random number generators shared by the samplers.
+
+Samplers own a generator, either a ``numpy.random.Generator`` or, on numpy
+versions without one, a ``numpy.random.RandomState``, and draw only from it.
+Without a seed they use the global ``numpy.random`` state as before.
+"""
+import copy
+import numpy as np
+
+def makerng(seed=None):
+    """Returns a generator for ``seed``: the global numpy state for ``None``,
+    ``seed`` itself if it is already a generator, otherwise a new
+    ``Generator`` (or ``RandomState`` on older numpy) seeded with it."""
+    if seed is None:
+        return np.random.mtrand._rand
+    if isinstance(seed, np.random.RandomState) or hasattr(seed, 'bit_generator'):
+        return seed
+    if hasattr(np.random, 'default_rng'):
+        return np.random.default_rng(seed)
+    return np.random.RandomState(seed)
+
+def spawnrngs(rng, n):
+    """Returns ``n`` independent child generators of ``rng``, the same ones
+    every time for a given seed. Generators are spawned from their seed
+    sequence; a ``RandomState`` seeds its children with draws from itself."""
+    if hasattr(rng, 'spawn'):
+        return rng.spawn(n)
+    seedseq = getattr(getattr(rng, 'bit_generator', None), '_seed_seq', None)
+    if seedseq is not None:
+        bitgen = type(rng.bit_generator)
+        return [np.random.Generator(bitgen(s)) for s in seedseq.spawn(n)]
+    seeds = rng.randint(1 << 32, size=(n, 4), dtype=np.int64).astype(np.uint32)
+    return [makerng(s) for s in seeds]
+
+def uniform(rng, size=None):
+    """Returns floats drawn uniformly from [0, 1)."""
+    if hasattr(rng, 'integers'):
+        return rng.random(size)
+    return rng.random_sample(size)
+
+def integers(rng, high, size=None):
+    """Returns integers drawn uniformly from [0, high)."""
+    if hasattr(rng, 'integers'):
+        return rng.integers(high, size=size)
+    return rng.randint(high, size=size)
+
+def validmask(cand, invalid):
+    """Returns the mask of entries of ``cand`` that are neither ``invalid``
+    nor repeats of an earlier entry of their row."""
+    order = cand.argsort(axis=1, kind='mergesort')
+    ranked = np.take_along_axis(cand, order, 1)
+    repeat = np.zeros(cand.shape, dtype=bool)
+    # a stable sort puts the first occurrence first in each run of equal items
+    np.put_along_axis(repeat, order[:, 1:], ranked[:, 1:] == ranked[:, :-1], 1)
+    return ~(invalid | repeat)
+
+def firstvalid(cand, invalid, k):
+    """Marks repeats in each row of ``cand`` after their first occurrence as
+    invalid too, and returns the rows with at least ``k`` valid entries and
+    the first ``k`` of them, in order, for those rows."""
+    valid = validmask(cand, invalid)
+    seen = valid.cumsum(axis=1)
+    done = seen[:, -1] >= k
+    take = valid[done] & (seen[done] <= k)
+    return done, cand[done][take].reshape(-1, k)
+
+class Spawnable(object):
+    """Base of the samplers that draw from their generator ``rng``."""
+
+    def spawn(self, n):
+        """Returns ``n`` copies of the sampler with independent child
+        generators, e.g. one per worker thread or process. The copies share
+        the sampler's tables rather than copying them."""
+        children = []
+        for rng in spawnrngs(self.rng, n):
+            child = copy.copy(self)
+            child.rng = rng
+            children.append(child)
+        return children
+
+class Sampler(Spawnable):
+    """Base of the samplers of a single distribution.
+
+    Subclasses provide ``_indices(count)``, drawing ``count`` item indices,
+    and ``_probabilities()``, the normalized weights of the items.
+    """
+
+    def sample_without_replacement(self, k, exclude=None, count=None, rounds=3):
+        """Returns ``k`` distinct random integers or keys, drawn one after
+        another with probabilities proportional to the weights of the items
+        not drawn yet, as if each draw removed its item.
+
+        When `count` is ``None``, returns an array of length ``k`` and
+        ``exclude`` is a sequence of item indices never to draw. Otherwise
+        returns a ``(count, k)`` array, one sample per row, and ``exclude``
+        holds the item index, or a row of indices, to exclude in each row,
+        such as the positive item of each example, or a single index to
+        exclude from all rows.
+
+        Draws with replacement and keeps first occurrences of items not
+        excluded, which is exact. Rows still short of ``k`` items after
+        ``rounds`` rounds keep the items they found and draw the rest by
+        Gumbel top-k over the weights of the items neither found nor
+        excluded, which continues the same sequence of draws, so the result
+        stays exact.
+        """
+        single = count is None
+        rows = 1 if single else count
+        exclude = np.zeros((rows, 0), dtype=int) if exclude is None else np.asarray(exclude, dtype=int)
+        if not single and exclude.ndim == 0:
+            # one item excluded from every row
+            exclude = np.repeat(exclude, rows)
+        exclude = exclude.reshape(rows, -1) if exclude.size else np.zeros((rows, 0), dtype=int)
+        if k == 0:
+            out = np.zeros(0 if single else (rows, 0), dtype=int)
+            return self.keys[out] if self.keys is not None else out
+        probs = self._probabilities()
+        # items of positive weight left in each row once excluded ones are gone
+        ranked = np.sort(exclude, axis=1)
+        first = np.ones(ranked.shape, dtype=bool)
+        first[:, 1:] = ranked[:, 1:] != ranked[:, :-1]
+        left = (probs > 0).sum() - (first & (probs[ranked] > 0)).sum(axis=1)
+        if (left < k).any():
+            raise ValueError("fewer than k items can be drawn")
+        out = np.empty((rows, k), dtype=int)
+        todo = np.arange(rows)
+        cand = np.zeros((rows, 0), dtype=int)
+        width = k + exclude.shape[1] + 8
+        for _ in range(rounds):
+            if not len(todo):
+                break
+            cand = np.hstack([cand, self._indices(len(todo) * width).reshape(len(todo), width)])
+            invalid = (cand[:, :, None] == exclude[todo][:, None, :]).any(axis=2)
+            done, found = firstvalid(cand, invalid, k)
+            out[todo[done]] = found
+            todo, cand = todo[~done], cand[~done]
+            width *= 2
+        if len(todo):
+            invalid = (cand[:, :, None] == exclude[todo][:, None, :]).any(axis=2)
+            valid = validmask(cand, invalid)
+            nfound = valid.sum(axis=1)
+            # the distinct items found so far, in order, left aligned
+            found = np.zeros((len(todo), k), dtype=int)
+            r, c = np.nonzero(valid)
+            found[r, valid.cumsum(axis=1)[r, c] - 1] = cand[r, c]
+            col = np.arange(k) - nfound[:, None]
+            step = max(1, (1 << 22) // len(probs))
+            with np.errstate(divide='ignore'):
+                logp = np.log(probs)
+                for start in range(0, len(todo), step):
+                    chunk = slice(start, start + step)
+                    rows = todo[chunk]
+                    keys = logp - np.log(-np.log(uniform(self.rng, (len(rows), len(probs)))))
+                    np.put_along_axis(keys, exclude[rows], -np.inf, 1)
+                    fr, fc = np.nonzero(col[chunk] < 0)
+                    keys[fr, found[chunk][fr, fc]] = -np.inf
+                    top = np.argpartition(-keys, k - 1, axis=1)[:, :k]
+                    order = np.argsort(-np.take_along_axis(keys, top, 1), axis=1)
+                    top = np.take_along_axis(top, order, 1)
+                    rest = np.take_along_axis(top, np.maximum(col[chunk], 0), 1)
+                    out[rows] = np.where(col[chunk] < 0, found[chunk], rest)
+        if single:
+            out = out[0]
+        return self.keys[out] if self.keys is not None else out
@@ -0,0 +1,123 @@
+from numpy import add, arange, array, concatenate, cumsum, minimum, ndarray, unique, zeros
+from common import Sampler, makerng, uniform
+
+class DynamicSampler(Sampler):
+    """Random objects with probabilities proportional to weights that can be
+    changed after construction.
+
+    The weights are kept in a Fenwick (binary indexed) tree, so `update()` of
+    one weight and drawing one sample both take O(log n) time, against the
+    O(n) rebuild the other samplers need when weights change. Samplers from
+    `spawn()` share the tree, so they see each other's updates.
+    """
+
+    def __init__(self, weights, keys=None, rng=None):
+        """Builds the tree over the weights (a list or tuple or iterable, in
+        any order and not necessarily summing to 1) in O(n). ``rng`` is a
+        seed or generator for `makerng()`."""
+        self.rng = makerng(rng)
+        if isinstance(weights, ndarray):
+            weights = weights.astype(float)
+        else:
+            weights = array(list(weights), dtype=float)
+        if weights.ndim != 1:
+            raise ValueError("weights must be a vector")
+        if (weights < 0).any() or not (weights > 0).any():
+            raise ValueError("weights must be non-negative with a positive sum")
+
+        self.n = n = len(weights)
+        self.keys = None if keys is None else array(keys)
+        self.weights = weights
+        self.rebuild()
+
+    def rebuild(self):
+        """Recomputes the tree from the weights, clearing the rounding error
+        that many updates accumulate."""
+        n = self.n
+        # node i sums the lowbit(i) weights ending at i, counting from 1
+        total = concatenate(([0.], cumsum(self.weights)))
+        i = arange(1, n + 1)
+        self.tree = zeros(n + 1)
+        self.tree[1:] = total[i] - total[i - (i & -i)]
+        self.top = 1 << (n.bit_length() - 1) if n else 0
+        # the number of positive weights, which updates must keep above 0 as
+        # __init__ requires; an array, so spawned samplers share it
+        self.positive = array([(self.weights > 0).sum()])
+
+    @property
+    def total(self):
+        """The sum of the weights, a prefix sum of the whole tree."""
+        s, i = 0., self.n
+        while i:
+            s += self.tree[i]
+            i -= i & -i
+        return s
+
+    def update(self, index, weight):
+        """Sets the weight of item ``index`` in O(log n) time."""
+        if weight < 0:
+            raise ValueError("weights must not be negative")
+        positive = self.positive[0] + (weight > 0) - (self.weights[index] > 0)
+        if not positive:
+            raise ValueError("weights must keep a positive sum")
+        self.positive[0] = positive
+        delta = weight - self.weights[index]
+        self.weights[index] = weight
+        i = index % self.n + 1
+        while i <= self.n:
+            self.tree[i] += delta
+            i += i & -i
+
+    def update_many(self, indices, weights):
+        """Sets the weights of several items at once, taking the last weight
+        given for repeated indices; the tree is walked level by level for all
+        of them together."""
+        indices = array(indices, dtype=int).ravel() % self.n
+        weights = array(weights, dtype=float).ravel()
+        if (weights < 0).any():
+            raise ValueError("weights must not be negative")
+        # keep the last occurrence of each index
+        last, first = unique(indices[::-1], return_index=True)
+        weights = weights[::-1][first]
+        positive = self.positive[0] + (weights > 0).sum() - (self.weights[last] > 0).sum()
+        if not positive:
+            raise ValueError("weights must keep a positive sum")
+        self.positive[0] = positive
+        delta = weights - self.weights[last]
+        self.weights[last] = weights
+        i = last + 1
+        while len(i):
+            # distinct items can share ancestors, so accumulate
+            add.at(self.tree, i, delta)
+            i = i + (i & -i)
+            keep = i <= self.n
+            i, delta = i[keep], delta[keep]
+
+    def random(self, count=None):
+        """Returns a given number of random integers or keys, with probabilities
+        being proportional to the current weights.
+
+        When `count` is ``None``, returns a single integer or key, otherwise
+        returns a NumPy array with a length given in `count`.
+        """
+        k = self._indices(1 if count is None else count)
+        if count is None:
+            k = k[0]
+        return self.keys[k] if self.keys is not None else k
+
+    def _indices(self, count):
+        u = uniform(self.rng, count) * self.total
+        pos = zeros(len(u), dtype=int)
+        step = self.top
+        while step:
+            nxt = pos + step
+            node = self.tree[minimum(nxt, self.n)]
+            move = (nxt <= self.n) & (node <= u)
+            pos[move] = nxt[move]
+            u[move] -= node[move]
+            step >>= 1
+        # pos counts the items whose weights are used up by u
+        return minimum(pos, self.n - 1)
+
+    def _probabilities(self):
+        return self.weights / self.weights.sum()
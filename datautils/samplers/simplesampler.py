@@ -1,18 +1,80 @@
 import numpy as np
+from common import Sampler, makerng, uniform
 
-class SimpleSampler(object):
-    def __init__(self, weights, keys = None):
-        if keys is None:
-            self.keys = np.arange(len(weights))
-        else:
-            self.keys = np.array(keys)
-        arr_weights = np.array(weights)
-        self.weights = weights / weights.sum()
-        self.cum = self.weights.cumsum()
+class SimpleSampler(Sampler):
+    """Inverse CDF sampling of random objects with different probabilities.
+
+    The cumulative distribution of the weights is stored as ``cum`` in
+    ``dtype``; float32 halves its memory and speeds up searches, but items
+    with less than about 1e-7 of the total weight may then never be drawn.
+    A draw is a binary search of ``cum``, O(log n), so the tables are built
+    in O(n) with no setup beyond a cumulative sum.
+    """
+
+    def __init__(self, weights, keys=None, rng=None, dtype=np.float64):
+        """Builds ``cum`` from the weights (a list or tuple or iterable, in any
+        order and not necessarily summing to 1). ``rng`` is a seed or
+        generator for `makerng()`."""
+        self.rng = makerng(rng)
+        if not isinstance(weights, np.ndarray):
+            weights = np.array(list(weights), dtype=float)
+        if weights.ndim != 1:
+            raise ValueError("weights must be a vector")
+        if (weights < 0).any() or not weights.sum() > 0:
+            raise ValueError("weights must be non-negative with a positive sum")
+        self.n = len(weights)
+        self.keys = None if keys is None else np.array(keys)
+        cum = np.cumsum(weights, dtype=np.float64)
+        cum /= cum[-1]
+        self.cum = cum.astype(dtype)
+        # uniforms are capped below cum[-1] = 1, as rounding to a float32
+        # could otherwise push them past the last item
+        self.top = np.nextafter(self.cum.dtype.type(1), self.cum.dtype.type(0))
+
+    @property
+    def weights(self):
+        """The normalized weights, as represented by ``cum``."""
+        return np.diff(np.concatenate(([0.], self.cum)))
+
+    def random(self, count=None):
+        """Returns a given number of random integers or keys, with probabilities
+        being proportional to the weights supplied in the constructor.
 
-    def random(self, count = None):
+        When `count` is ``None``, returns a single integer or key, otherwise
+        returns a NumPy array with a length given in `count`.
+        """
+        k = self._indices(1 if count is None else count)
         if count is None:
-            return self.keys[self.cum.searchsorted(np.random.random())][0]
+            k = k[0]
+        return self.keys[k] if self.keys is not None else k
+
+    def random_sorted(self, count):
+        """Returns `count` random integers or keys as `random()` does, but in
+        increasing order of index.
+
+        Sorted uniforms are made directly from cumulative exponential
+        spacings, in O(count), and merged with ``cum`` by a single search of
+        the smaller of the two sorted arrays in the larger, which also walks
+        memory in order.
+        """
+        spacings = -np.log(1 - uniform(self.rng, count + 1))
+        u = np.cumsum(spacings)
+        u = u[:-1] / u[-1]
+        if count < self.n:
+            k = self._search(u)
         else:
-            return self.keys[self.cum.searchsorted(np.random.random(count))]
+            # the number of draws below each boundary of cum
+            below = np.searchsorted(u, self.cum, 'left')
+            below[-1] = count
+            k = np.repeat(np.arange(self.n), np.diff(np.concatenate(([0], below))))
+        return self.keys[k] if self.keys is not None else k
+
+    def _search(self, u):
+        u = np.minimum(u.astype(self.cum.dtype), self.top)
+        return self.cum.searchsorted(u, 'right')
+
+    def _indices(self, count):
+        return self._search(uniform(self.rng, count))
 
+    def _probabilities(self):
+        return self.weights
@@ -1,21 +1,78 @@
-from numpy import arange, array, bincount, ndarray, ones, where
-from numpy.random import seed, random, randint
+from numpy import arange, array, bincount, concatenate, cumsum, int32, int64, ndarray, searchsorted, where
+from numpy.random import seed
+from common import Sampler, makerng, uniform, integers
+from .. storage import savearrays, loadarrays
 
 __author__ = "Tamas Nepusz, Denis Bzowy"
 __version__ = "27jul2011"
 
-class WalkerSampler(object):
+def aliastables(weights, chunksize=1 << 20):
+    """Returns the Walker tables ``prob`` and ``inx`` for weights scaled to sum
+    to ``len(weights)``, in O(n) vectorized steps.
+
+    The tables are those of the classic loop, which repeatedly pairs the last
+    short (weight < 1) item with the last long (weight > 1) one and turns the
+    long item short once its weight drops below 1. Every short item is paired
+    in order with a long one, so the pairing is read off the cumulative sums
+    of the short items' deficits and the long items' excesses: an item goes to
+    the first long item whose excess isn't used up by the deficits before it,
+    and a long item is used up by the first short item whose cumulative
+    deficit passes its cumulative excess. Short items left unpaired through
+    float drift alias the last long item, which ends with ``prob`` 1, so items
+    of zero weight are never drawn. The searches run over chunks of
+    ``chunksize`` items to bound temporary memory.
+    """
+    n = len(weights)
+    prob = array(weights, dtype=float)
+    index = int32 if n < 2 ** 31 else int64
+    inx = arange(n, dtype=index)
+    short = where(prob < 1)[0][::-1].astype(index)
+    long = where(prob > 1)[0][::-1].astype(index)
+    if len(short) == 0 or len(long) == 0:
+        prob[:] = 1
+        return prob, inx
+    deficit = 1 - prob[short]
+    cumsum(deficit, out=deficit)
+    excess = prob[long] - 1
+    cumsum(excess, out=excess)
+    for start in range(0, len(short), chunksize):
+        # the long item each short one is paired with, from the deficit before it
+        items = short[start:start + chunksize]
+        if start:
+            before = deficit[start - 1:start + len(items) - 1]
+        else:
+            before = concatenate(([0.], deficit[:len(items) - 1]))
+        pair = searchsorted(excess, before, 'left')
+        paired = pair < len(long)
+        inx[items[paired]] = long[pair[paired]]
+        inx[items[~paired]] = long[-1]
+    prob[long] = 1
+    for start in range(0, len(long), chunksize):
+        # long items used up, after which they are short and paired with the next
+        end = searchsorted(deficit, excess[start:start + chunksize], 'right')
+        used = where(end < len(short))[0]
+        items = long[start:start + chunksize]
+        prob[items[used]] = 1 + excess[start + used] - deficit[end[used]]
+        used = used[start + used + 1 < len(long)]
+        inx[items[used]] = long[start + used + 1]
+    prob[long[-1]] = 1
+    inx[long[-1]] = long[-1]
+    return prob, inx
+
+class WalkerSampler(Sampler):
     """Walker's alias method for random objects with different probablities.
     
     Based on the implementation of Denis Bzowy at the following URL:
     http://code.activestate.com/recipes/576564-walkers-alias-method-for-random-objects-with-diffe/
     """
     
-    def __init__(self, weights, keys=None):
+    def __init__(self, weights, keys=None, rng=None):
         """Builds the Walker tables ``prob`` and ``inx`` for calls to `random()`.
         The weights (a list or tuple or iterable) can be in any order and they
-        do not even have to sum to 1."""
+        do not even have to sum to 1. ``rng`` is a seed or generator for
+        `makerng()`."""
         n = self.n = len(weights)
+        self.rng = makerng(rng)
         
         if keys is None:
             self.keys = keys
@@ -35,21 +92,7 @@ class WalkerSampler(object):
         self.orig_weights = weights / weights.sum()
         weights = weights * n / weights.sum()
 
-        inx = -ones(n, dtype=int)
-        short = where(weights < 1)[0].tolist()
-        long = where(weights > 1)[0].tolist()
-        while short and long:
-            j = short.pop()
-            k = long[-1]
-
-            inx[j] = k
-            weights[k] -= (1 - weights[j])
-            if weights[k] < 1:
-                short.append( k )
-                long.pop()
-
-        self.prob = weights
-        self.inx = inx
+        self.prob, self.inx = aliastables(weights)
 
     def random(self, count=None):
         """Returns a given number of random integers or keys, with probabilities
@@ -59,19 +102,52 @@ class WalkerSampler(object):
         returns a NumPy array with a length given in `count`.
         """
         if count is None:
-            u = random()
-            j = randint(self.n)
+            u = uniform(self.rng)
+            j = integers(self.rng, self.n)
             k = j if u <= self.prob[j] else self.inx[j]
             return self.keys[k] if self.keys is not None else k
 
-        u = random(count)
-        j = randint(self.n, size=count)
-        k = where(u <= self.prob[j], j, self.inx[j])
+        k = self._indices(count)
         return self.keys[k] if self.keys is not None else k
 
+    def _indices(self, count):
+        u = uniform(self.rng, count)
+        j = integers(self.rng, self.n, count)
+        return where(u <= self.prob[j], j, self.inx[j])
+
+    def _probabilities(self):
+        return self.orig_weights
+
+    def save(self, path):
+        """Saves the tables and keys to the directory ``path``, see
+        `datautils.storage`. String keys go in a string table."""
+        arrays = {'prob': self.prob, 'inx': self.inx, 'weights': self.orig_weights}
+        strings = None
+        if self.keys is not None:
+            if self.keys.dtype.kind in 'SU':
+                strings = self.keys.tolist()
+            else:
+                arrays['keys'] = self.keys
+        savearrays(path, 'WalkerSampler', {}, arrays, strings)
+
+    @classmethod
+    def load(cls, path, mmap=True, rng=None):
+        """Loads a sampler saved to ``path``, memory mapping its tables read
+        only if ``mmap``."""
+        meta, arrays, strings = loadarrays(path, 'WalkerSampler', mmap)
+        sampler = cls.__new__(cls)
+        sampler.rng = makerng(rng)
+        sampler.prob, sampler.inx = arrays['prob'], arrays['inx']
+        sampler.orig_weights = arrays['weights']
+        sampler.n = len(sampler.prob)
+        sampler.keys = array(strings) if strings is not None else arrays.get('keys')
+        return sampler
+
 
 if __name__ == "__main__":
     # little examples, self-contained --
+    # the package relative imports above need it run as a module:
+    # python -m datautils.samplers.walkersampler
     N = 5
     Nrand = 1000
     randomseed = 1
@@ -93,8 +169,8 @@ if __name__ == "__main__":
     from collections import defaultdict
     rand = defaultdict(int)
     for sample in wrand.random(Nrand):
-        nrand[sample] += 1
-    s = str(sorted(nrand.iteritems()))
+        rand[sample] += 1
+    s = str(sorted(rand.iteritems()))
     print s
     if N==5 and Nrand==1000 and randomseed==1:
         assert s == "[('A', 85), ('B', 199), ('C', 343), ('D', 373)]"
@@ -0,0 +1,111 @@
+"""Binary save and load of vocabularies, representations and samplers.
+
+An object is saved as a directory holding one .npy file per array and a
+meta.json file with its class, scalar attributes and array names, written
+last. Strings are stored as a string table: the items joined into one uint8
+blob with the offsets of each item, so loading is a single split rather than
+unpickling millions of objects. Arrays can be memory mapped on load, so large count,
+code and alias tables are shared between processes and loaded in
+milliseconds.
+"""
+import os, json, tempfile
+from itertools import count
+import numpy as np
+try:
+    from itertools import izip as _zip
+except ImportError:
+    _zip = zip
+
+FORMAT = 1
+_text = type(u'')
+
+def indexdict(items):
+    """Return the dict mapping each of items to its index."""
+    return dict(_zip(items, count()))
+
+def packstrings(items):
+    """Return a (blob, offsets, kind) string table for a sequence of strings,
+    all bytes (kind 'bytes') or all text (kind 'text', stored as utf-8).
+    Item i is blob[offsets[i]:offsets[i + 1]]."""
+    items = list(items)
+    if all(isinstance(item, bytes) for item in items):
+        kind = 'bytes'
+    elif all(isinstance(item, _text) for item in items):
+        kind = 'text'
+        items = [item.encode('utf-8') for item in items]
+    else:
+        raise TypeError('only tables of all bytes or all text strings can be saved')
+    offsets = np.zeros(len(items) + 1, dtype = np.int64)
+    np.cumsum([len(item) + 1 for item in items], out = offsets[1:])
+    # items are separated by a NUL byte, letting load split the blob at once
+    blob = np.frombuffer(b'\0'.join(items) + b'\0', dtype = np.uint8) if items else np.zeros(0, dtype = np.uint8)
+    return blob, offsets, kind
+
+def unpackstrings(blob, offsets, kind):
+    """Return the list of strings in a table made by packstrings."""
+    data = np.asarray(blob).tobytes()
+    n = len(offsets) - 1
+    items = data.split(b'\0')[:-1] if n else []
+    if len(items) != n:
+        # some item holds a NUL byte itself
+        offsets = np.asarray(offsets).tolist()
+        items = [data[offsets[i]:offsets[i + 1] - 1] for i in range(n)]
+    if kind == 'text':
+        items = [item.decode('utf-8') for item in items]
+    return items
+
+def _replace(path, write):
+    """Call write on a temporary file next to path, then rename it to path,
+    so readers, including ones memory mapping the old file, never see a
+    partial file."""
+    fd, tmp = tempfile.mkstemp(dir = os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.rename(tmp, path)
+    except:
+        os.remove(tmp)
+        raise
+
+def savearrays(path, kind, meta, arrays, strings = None):
+    """Save arrays, a dict of name to array, and the string table of strings,
+    if given, to the directory path, with meta (JSON serializable scalars),
+    kind, the class saved, and the array names in meta.json. Every file is
+    replaced by a rename, and arrays of an earlier save to path that aren't
+    saved again are removed."""
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    arrays = dict(arrays)
+    meta = dict(meta, kind = kind, format = FORMAT)
+    if strings is not None:
+        arrays['strings'], arrays['offsets'], meta['strings'] = packstrings(strings)
+    meta['arrays'] = sorted(arrays)
+    for name, array in arrays.items():
+        _replace(os.path.join(path, name + '.npy'), lambda f: np.save(f, np.asarray(array)))
+    _replace(os.path.join(path, 'meta.json'), lambda f: f.write(json.dumps(meta).encode('utf-8')))
+    for name in os.listdir(path):
+        if name.endswith('.npy') and name[:-4] not in arrays:
+            os.remove(os.path.join(path, name))
+
+def loadarrays(path, kind, mmap = True, writable = ()):
+    """Load what savearrays saved to path as (meta, arrays, strings), checking
+    it holds a kind. With mmap the arrays are memory mapped, read only unless
+    named in writable, which are copy on write."""
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta.get('kind') != kind:
+        raise ValueError('%s holds a %s, not a %s' % (path, meta.get('kind'), kind))
+    if meta.get('format') != FORMAT:
+        raise ValueError('unknown format %r in %s' % (meta.get('format'), path))
+    arrays = {}
+    for name in meta['arrays']:
+        mode = ('c' if name in writable else 'r') if mmap else None
+        try:
+            arrays[name] = np.load(os.path.join(path, name + '.npy'), mmap_mode = mode)
+        except ValueError:
+            # empty arrays can't be memory mapped
+            arrays[name] = np.load(os.path.join(path, name + '.npy'))
+    strings = None
+    if 'strings' in meta:
+        strings = unpackstrings(arrays.pop('strings'), arrays.pop('offsets'), meta['strings'])
+    return meta, arrays, strings
@@ -1,6 +1,7 @@
-from .. representation import RandBinRep, OneHotRep, OneHotOffsetRep, wheregt, onehotarray, binarray
+from .. representation import IntRep, BinaryTreeSoftmaxRep, RepCache, RandBinRep, OneHotRep, OneHotOffsetRep, wheregt, onehotarray, binarray, packcodes, unpackcodes, hammingknn
 import unittest, sys
 import numpy as np
+import scipy.sparse as sp
 
 class TestFuncs(unittest.TestCase):
     def test_wheregt(self):
@@ -23,6 +24,50 @@ class TestFuncs(unittest.TestCase):
         b = np.array([1, 0, 1, 0, 1])
         self.assertTrue(not (a - b).any())
 
+class TestIntRep(unittest.TestCase):
+    def test_passed_vocab(self):
+        vocab = ['the', 'cat', 'in', 'the', 'hat']
+        ir = IntRep(vocab)
+        self.assertEqual(ir.dim, 5)
+        self.assertEqual([ir[item] for item in vocab], [1, 2, 3, 1, 4])
+        self.assertEqual([ir.inv(ir[item]) for item in vocab], vocab)
+        self.assertEqual(ir['dog'], 0)
+        self.assertEqual(ir.inv(-1), ir.notfound)
+        self.assertEqual(ir.inv(5), ir.notfound)
+        self.assertEqual(ir.counts.tolist(), [0, 2, 1, 1, 1])
+
+    def test_bulk(self):
+        vocab = ['the', 'cat', 'in', 'the', 'hat']
+        ir = IntRep()
+        for item in vocab:
+            ir.add(item)
+        ids = ir.add_many(['dog'] * 40 + vocab)
+        self.assertEqual(ids.tolist()[-6:], [5, 1, 2, 3, 1, 4])
+        self.assertEqual(ir.counts.tolist(), [0, 4, 2, 2, 2, 40])
+        self.assertEqual(ir.encode(['hat', 'bat']).tolist(), [4, 0])
+        self.assertEqual(ir.encode(['hat']).dtype, np.int32)
+        self.assertEqual(ir.decode([4, 0, 99, -1]), ['hat', ir.notfound, ir.notfound, ir.notfound])
+
+    def test_topk(self):
+        ir = IntRep('abbcccddddeeeeffg')
+        self.assertEqual(ir.topk(), [(4, 4), (5, 4), (3, 3), (2, 2), (6, 2), (1, 1), (7, 1), (0, 0)])
+        for k in range(10):
+            self.assertEqual(ir.topk(k), ir.topk()[:k])
+        self.assertEqual(ir.topk(2, get_item = True), [('d', 4), ('e', 4)])
+
+    def test_prune(self):
+        ir = IntRep('abbcccddddeeeeffg')
+        pruned, remap = ir.prune(min_count = 2)
+        self.assertEqual(pruned.idx_to_item, [ir.notfound, 'b', 'c', 'd', 'e', 'f'])
+        self.assertEqual(pruned.counts.tolist(), [2, 2, 3, 4, 4, 2])
+        self.assertEqual(remap.tolist(), [0, 0, 1, 2, 3, 4, 5, 0])
+        self.assertEqual(pruned.encode('abg').tolist(), remap[ir.encode('abg')].tolist())
+        pruned, remap = ir.prune(min_count = 2, max_size = 4)
+        self.assertEqual(pruned.idx_to_item, [ir.notfound, 'c', 'd', 'e'])
+        self.assertEqual(pruned.counts.tolist(), [6, 3, 4, 4])
+        pruned.add('z')
+        self.assertEqual(pruned['z'], 4)
+
 class TestOneHotRep(unittest.TestCase):
     def test_passed_vocab(self):
         vocab = ['the', 'cat', 'in', 'the', 'hat']
@@ -88,5 +133,165 @@ class TestRandBinRep(unittest.TestCase):
             outitem = rbr.itemfrom(outrep)
             self.assertEqual(item, outitem)
 
+class TestPackedCodes(unittest.TestCase):
+    def test_pack(self):
+        bits = np.random.random((5, 70)) > 0.5
+        codes = packcodes(bits)
+        self.assertEqual((codes.shape, codes.dtype), ((5, 2), np.uint64))
+        self.assertTrue(np.array_equal(unpackcodes(codes, 70), bits))
+
+    def test_knn(self):
+        bits = np.random.random((50, 100)) > 0.5
+        queries = np.random.random((7, 100)) > 0.5
+        dist = (queries[:, None, :] != bits[None, :, :]).sum(axis = 2)
+        idx, d = hammingknn(packcodes(queries), packcodes(bits), k = 3, blocksize = 100)
+        self.assertEqual(idx.shape, (7, 3))
+        self.assertTrue(np.array_equal(d, np.sort(dist, axis = 1)[:, :3]))
+        self.assertTrue(np.array_equal(d, np.take_along_axis(dist, idx, 1)))
+
+    def test_knn_ties(self):
+        # many equal codes, so the k-th distance is shared by several rows
+        bits = np.random.RandomState(0).random_sample((200, 8)) > 0.5
+        queries = bits[:5]
+        dist = (queries[:, None, :] != bits[None, :, :]).sum(axis = 2)
+        for k in [1, 4, 30]:
+            idx, d = hammingknn(packcodes(queries), packcodes(bits), k = k, blocksize = 300)
+            expected = np.argsort(dist, axis = 1, kind = 'mergesort')[:, :k]
+            self.assertTrue(np.array_equal(idx, expected))
+
+    def test_unique_codes(self):
+        rbr = RandBinRep(4, range(15), p = 0.5)
+        self.assertEqual(len(set(map(tuple, rbr.codes.tolist()))), 16)
+        self.assertRaises(ValueError, rbr.add, 'one too many')
+        self.assertEqual(len(rbr.idx_to_item), 16)
+        self.assertEqual([rbr.itemfrom(rbr[i]) for i in range(15)], list(range(15)))
+
+class TestDecodeBatch(unittest.TestCase):
+    def test_itemfrom_batch(self):
+        vocab = ['the', 'cat', 'in', 'the', 'hat']
+        for rep in [OneHotRep(vocab), OneHotOffsetRep(2, 3, vocab), RandBinRep(10, vocab)]:
+            m = np.vstack([rep[item] for item in vocab])
+            self.assertEqual(rep.itemfrom_batch(m), vocab)
+
+    def test_bags(self):
+        ohr = OneHotRep(['the', 'cat', 'in', 'the', 'hat'])
+        bags = [['the', 'hat'], [], ['cat', 'in', 'hat']]
+        m = np.vstack([ohr.bagrep(bag) for bag in bags])
+        self.assertEqual(ohr.bagfrom_batch(m), bags)
+        self.assertEqual([ohr.bagfrom(row) for row in m], bags)
+        self.assertEqual(ohr.bagfrom_batch(sp.csr_matrix(m)), bags)
+        self.assertEqual(ohr.bagfrom_batch(sp.csr_matrix(m), -1.), [ohr.bagfrom(row, -1.) for row in m])
+
+    def test_sparse_batches(self):
+        vocab = ['the', 'cat', 'in', 'the', 'hat']
+        for rep in [OneHotRep(vocab), OneHotOffsetRep(2, 3, vocab), RandBinRep(10, vocab)]:
+            self.assertEqual(rep.itemfrom_batch(rep.sparse_batch(vocab)), vocab)
+        ohr = OneHotRep(vocab)
+        self.assertEqual(ohr.bagfrom_batch(ohr.sparse_batch(vocab + ['dog'])), [[item] for item in vocab] + [[ohr.notfound]])
+
+    def test_nearest(self):
+        np.random.seed(0)
+        rbr = RandBinRep(64, ['item%d' % i for i in range(50)], p = 0.2)
+        items = ['item%d' % i for i in range(50)]
+        noisy = rbr.encode_batch(items)
+        noisy[:, 0] = 1 - noisy[:, 0]
+        self.assertEqual(rbr.itemfrom_batch(noisy, 0.5), items)
+        self.assertEqual(rbr.itemfrom(noisy[3], 0.5), 'item3')
+        self.assertEqual(rbr.itemfrom(noisy[3], 0.5, nearest = False), '__ITEM_NOT_FOUND__')
+        self.assertEqual(set(rbr.itemfrom_batch(noisy, 0.5, nearest = False)), set(['__ITEM_NOT_FOUND__']))
+
+class TestRepCache(unittest.TestCase):
+    def test_lru(self):
+        cache = RepCache(maxitems = 2)
+        cache['a'], cache['b'] = np.zeros(1), np.zeros(1)
+        cache['a']
+        cache['c'] = np.zeros(1)
+        self.assertTrue('a' in cache and 'c' in cache and 'b' not in cache)
+        self.assertRaises(KeyError, lambda: cache['b'])
+        self.assertEqual(cache.stats(), {'entries': 2, 'nbytes': 16, 'hits': 1, 'misses': 1, 'evictions': 1})
+
+    def test_bounds(self):
+        ohr = OneHotRep(['the', 'cat', 'in', 'the', 'hat'], cache = RepCache(maxbytes = 100))
+        for item in ['the', 'cat', 'hat', 'dog', 'bird']:
+            expected = item if item in ohr.item_to_idx else ohr.notfound
+            self.assertEqual(ohr.itemfrom(ohr[item]), expected)
+        self.assertEqual(len(ohr.item_to_rep), 2)
+        self.assertTrue(ohr.item_to_rep.nbytes <= 100)
+        self.assertTrue(ohr.notfound in ohr.item_to_rep)
+        rbr = RandBinRep(10, ['the', 'cat'], cache = RepCache(maxitems = 0))
+        self.assertEqual(rbr.itemfrom(rbr['cat']), 'cat')
+        self.assertEqual(len(rbr.item_to_rep), 0)
+
+class TestSparse(unittest.TestCase):
+    def reps(self):
+        vocab = ['the', 'cat', 'in', 'the', 'hat']
+        return vocab, [OneHotRep(vocab), OneHotOffsetRep(2, 3, vocab), RandBinRep(10, vocab)]
+
+    def test_sparse_batch(self):
+        vocab, reps = self.reps()
+        items = vocab + ['dog']
+        for rep in reps:
+            m = rep.sparse_batch(items)
+            self.assertEqual(m.shape, (len(items), rep.dim))
+            self.assertTrue(np.array_equal(m.toarray(), np.vstack([rep[item] for item in items])))
+            for item, row in zip(items, m):
+                self.assertEqual(tuple(row.indices), tuple(rep.indices(item)))
+
+    def test_encode_batch(self):
+        vocab, reps = self.reps()
+        items = vocab + ['dog']
+        for rep in reps:
+            m = rep.encode_batch(items)
+            self.assertEqual(m.dtype, np.float32)
+            self.assertTrue(np.array_equal(m, np.vstack([rep[item] for item in items])))
+            out = np.ones((len(items), rep.dim), dtype = np.uint8)
+            self.assertTrue(rep.encode_batch(items, out = out) is out)
+            self.assertTrue(np.array_equal(out, m))
+        ir = IntRep(vocab)
+        self.assertEqual(ir.encode_batch(items).tolist(), ir.encode(items).tolist())
+        out = np.zeros(len(items), dtype = np.int64)
+        self.assertEqual(ir.encode_batch(items, out = out).tolist(), ir.encode(items).tolist())
+
+    def test_sparse_mode(self):
+        # the same seed gives both RandBinReps the same codes
+        np.random.seed(0)
+        vocab, reps = self.reps()
+        np.random.seed(0)
+        sparse = [OneHotRep(vocab, sparse = True), OneHotOffsetRep(2, 3, vocab, sparse = True), RandBinRep(10, vocab, sparse = True)]
+        for rep, sparserep in zip(reps, sparse):
+            for item in vocab + ['dog']:
+                self.assertEqual(sparserep[item].shape, (1, rep.dim))
+                self.assertTrue(np.array_equal(sparserep[item].toarray()[0], rep[item]))
+                expected = item if item in vocab else rep.notfound
+                self.assertEqual(sparserep.itemfrom(sparserep[item]), expected)
+
+class TestBinaryTreeSoftmaxRep(unittest.TestCase):
+    def test_balanced(self):
+        for n in [1, 2, 5, 8]:
+            bt = BinaryTreeSoftmaxRep(n)
+            self.assertEqual(bt.depth, int(np.ceil(np.log2(n))))
+            paths = set(tuple(bt[i][1]) for i in range(n))
+            self.assertEqual(len(paths), n)
+
+    def test_huffman(self):
+        ir = IntRep('abbcccccccccddddddddddddddddddd')
+        bt = BinaryTreeSoftmaxRep.fromintrep(ir)
+        self.assertEqual(bt.lengths.tolist(), [4, 4, 3, 2, 1])
+        nodes, codes = bt[ir['d']]
+        self.assertEqual(nodes.tolist(), [3])
+        self.assertTrue((bt.nodes[bt.mask] < ir.dim - 1).all())
+
+    def test_logprob(self):
+        bt = BinaryTreeSoftmaxRep(7, [1, 5, 2, 8, 1, 1, 3])
+        ids = np.arange(7)
+        scores = np.random.randn(6)
+        self.assertAlmostEqual(np.exp(bt.logprob(ids, scores)).sum(), 1.)
+        rows = np.random.randn(7, 6)
+        logp = bt.logprob(ids, rows)
+        for i in ids:
+            nodes, codes = bt[i]
+            expected = sum(np.log(1. / (1. + np.exp(-(2 * c - 1) * rows[i, node]))) for node, c in zip(nodes, codes))
+            self.assertAlmostEqual(logp[i], expected)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,254 @@
+from .. samplers import WalkerSampler, DynamicSampler, SimpleSampler, BufferedSampler, BatchedSampler
+from .. samplers.common import makerng, spawnrngs
+from .. samplers.walkersampler import aliastables
+import unittest, threading
+import numpy as np
+
+def implied(prob, inx):
+    """The distribution sampled from alias tables."""
+    p = prob.copy()
+    np.add.at(p, inx, 1 - prob)
+    return p / len(prob)
+
+class TestAliasTables(unittest.TestCase):
+    def test_implied_probabilities(self):
+        rng = np.random.RandomState(0)
+        for n in [1, 2, 10, 1000]:
+            for weights in [rng.pareto(1., n), np.floor(rng.pareto(1., n) * 3) + 1, np.ones(n)]:
+                weights = weights * n / weights.sum()
+                prob, inx = aliastables(weights)
+                self.assertTrue(((prob >= 0) & (prob <= 1)).all())
+                self.assertTrue(((inx >= 0) & (inx < n)).all())
+                self.assertEqual(inx.dtype, np.int32)
+                self.assertTrue(np.allclose(implied(prob, inx), weights / n))
+
+    def test_chunks(self):
+        weights = np.random.RandomState(1).pareto(1., 5000)
+        weights *= len(weights) / weights.sum()
+        for a, b in zip(aliastables(weights), aliastables(weights, chunksize = 7)):
+            self.assertTrue(np.array_equal(a, b))
+
+    def test_sampler(self):
+        np.random.seed(0)
+        sampler = WalkerSampler([1, 2, 3, 4], list('abcd'))
+        draws = sampler.random(40000)
+        freq = np.array([np.sum(draws == key) for key in 'abcd']) / 40000.
+        self.assertTrue(np.allclose(freq, [.1, .2, .3, .4], atol = 0.01))
+
+class TestDynamicSampler(unittest.TestCase):
+    def prefix(self, sampler, i):
+        s = 0.
+        while i:
+            s += sampler.tree[i]
+            i -= i & -i
+        return s
+
+    def check_tree(self, sampler):
+        cs = np.cumsum(sampler.weights)
+        for i in range(1, sampler.n + 1):
+            self.assertAlmostEqual(self.prefix(sampler, i), cs[i - 1])
+
+    def test_updates(self):
+        rng = np.random.RandomState(0)
+        sampler = DynamicSampler(rng.rand(37))
+        self.check_tree(sampler)
+        for _ in range(50):
+            sampler.update(rng.randint(37), rng.rand())
+        self.check_tree(sampler)
+        sampler.update_many([3, 5, 3, 36], [1., 2., 0., 4.])
+        self.assertEqual(sampler.weights[[3, 5, 36]].tolist(), [0., 2., 4.])
+        self.check_tree(sampler)
+        self.assertAlmostEqual(sampler.total, sampler.weights.sum())
+
+    def test_random(self):
+        np.random.seed(0)
+        sampler = DynamicSampler([1, 0, 2, 3, 4], list('abcde'))
+        sampler.update(0, 0)
+        sampler.update(1, 1)
+        draws = sampler.random(50000)
+        freq = np.array([np.sum(draws == key) for key in 'abcde']) / 50000.
+        self.assertTrue(np.allclose(freq, [0., .1, .2, .3, .4], atol = 0.01))
+        self.assertIn(sampler.random(), 'bcde')
+        self.assertEqual(DynamicSampler([0, 0, 5]).random(10).tolist(), [2] * 10)
+
+    def test_positive_total(self):
+        for weights in [[], [0, 0, 0]]:
+            self.assertRaises(ValueError, DynamicSampler, weights)
+        sampler = DynamicSampler([0, 1, 2])
+        child = sampler.spawn(1)[0]
+        sampler.update(1, 0)
+        self.assertRaises(ValueError, child.update, 2, 0)
+        self.assertRaises(ValueError, sampler.update_many, [0, 2], [0, 0])
+        self.assertEqual(sampler.weights.tolist(), [0, 0, 2])
+        sampler.update_many([0, 2], [1, 0])
+        self.assertEqual(sampler.random(5).tolist(), [0] * 5)
+
+class TestRNG(unittest.TestCase):
+    def samplers(self, rng):
+        weights = np.arange(1., 11.)
+        return [WalkerSampler(weights, rng = rng), DynamicSampler(weights, rng = rng), SimpleSampler(weights, rng = rng)]
+
+    def test_seeded(self):
+        for a, b in zip(self.samplers(3), self.samplers(3)):
+            self.assertEqual(a.random(100).tolist(), b.random(100).tolist())
+            self.assertEqual(a.random(), b.random())
+        rng = np.random.RandomState(0)
+        self.assertIs(makerng(rng), rng)
+        self.assertIs(WalkerSampler([1, 2], rng = rng).rng, rng)
+
+    def test_spawn(self):
+        for sampler, again in zip(self.samplers(5), self.samplers(5)):
+            draws = [child.random(200).tolist() for child in sampler.spawn(3)]
+            self.assertNotEqual(draws[0], draws[1])
+            self.assertEqual(draws, [child.random(200).tolist() for child in again.spawn(3)])
+        children = self.samplers(5)[0].spawn(2)
+        self.assertIs(children[0].prob, children[1].prob)
+        self.assertEqual(len(spawnrngs(makerng(1), 4)), 4)
+
+    def test_threads(self):
+        sampler = WalkerSampler(np.arange(1., 101.), rng = 7)
+        children = sampler.spawn(4)
+        results = [None] * 4
+        def work(i):
+            results[i] = np.concatenate([children[i].random(100) for _ in range(50)])
+        threads = [threading.Thread(target = work, args = (i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        expected = [np.concatenate([c.random(100) for _ in range(50)]) for c in WalkerSampler(np.arange(1., 101.), rng = 7).spawn(4)]
+        for r, e in zip(results, expected):
+            self.assertTrue(np.array_equal(r, e))
+
+class TestBufferedSampler(unittest.TestCase):
+    def test_blocks(self):
+        buffered = BufferedSampler(WalkerSampler(np.arange(1., 11.), rng = 2), blocksize = 64)
+        draws = [buffered.random() for _ in range(200)]
+        sampler = WalkerSampler(np.arange(1., 11.), rng = 2)
+        expected = sum([sampler.random(64).tolist() for _ in range(4)], [])[:200]
+        self.assertEqual(draws, expected)
+        self.assertEqual(len(buffered.random(10)), 10)
+
+    def check_update(self, background):
+        with BufferedSampler(DynamicSampler([1., 1., 1.], rng = 0), 32, background) as buffered:
+            for _ in range(100):
+                buffered.random()
+            buffered.update(0, 0.)
+            buffered.update_many([1], [0.])
+            self.assertEqual(set(buffered.random() for _ in range(500)), set([2]))
+
+    def test_update(self):
+        self.check_update(False)
+
+    def test_background(self):
+        self.check_update(True)
+        with BufferedSampler(WalkerSampler([1., 3.], rng = 1), 1000, background = True) as buffered:
+            freq = np.mean([buffered.random() for _ in range(20000)])
+        self.assertAlmostEqual(freq, 0.75, delta = 0.02)
+
+    def test_closed(self):
+        buffered = BufferedSampler(WalkerSampler([1., 3.], rng = 1), 16, background = True)
+        buffered.random()
+        buffered.close()
+        self.assertEqual(len([buffered.random() for _ in range(100)]), 100)
+
+    def test_producer_error(self):
+        class Failing(object):
+            def random(self, count):
+                raise RuntimeError('broken sampler')
+        buffered = BufferedSampler(Failing(), 16, background = True)
+        self.assertRaises(RuntimeError, buffered.random)
+        self.assertRaises(RuntimeError, buffered.random)
+        buffered.close()
+
+class TestSimpleSampler(unittest.TestCase):
+    def test_weights(self):
+        for weights in [[1, 0, 3], (1, 0, 3), iter([1, 0, 3]), np.array([1, 0, 3])]:
+            sampler = SimpleSampler(weights, rng = 0)
+            self.assertTrue(np.allclose(sampler.weights, [.25, 0., .75]))
+            self.assertIn(sampler.random(), [0, 2])
+        self.assertRaises(ValueError, SimpleSampler, [0, 0])
+        self.assertRaises(ValueError, SimpleSampler, [1, -1, 2])
+
+    def test_dtype(self):
+        weights = [2., 0., 1., 1., 0.]
+        for dtype in [np.float64, np.float32]:
+            sampler = SimpleSampler(weights, list('abcde'), rng = 1, dtype = dtype)
+            self.assertEqual(sampler.cum.dtype, dtype)
+            draws = sampler.random(40000)
+            freq = np.array([np.mean(draws == key) for key in 'abcde'])
+            self.assertTrue(np.allclose(freq, [.5, 0., .25, .25, 0.], atol = 0.01))
+
+    def test_random_sorted(self):
+        for n, count in [(1000, 100), (4, 40000)]:
+            weights = np.arange(n) % 4
+            sampler = SimpleSampler(weights, rng = 2, dtype = np.float32)
+            draws = sampler.random_sorted(count)
+            self.assertEqual(len(draws), count)
+            self.assertTrue((np.diff(draws) >= 0).all())
+            self.assertTrue((weights[draws] > 0).all())
+        self.assertTrue(np.allclose(np.bincount(draws, minlength = 4) / 40000., [0, 1 / 6., 2 / 6., 3 / 6.], atol = 0.01))
+
+class TestWithoutReplacement(unittest.TestCase):
+    weights = np.array([5., 1., 0., 2., 2.])
+
+    def samplers(self):
+        return [cls(self.weights, rng = 0) for cls in (WalkerSampler, SimpleSampler, DynamicSampler)]
+
+    def test_distinct(self):
+        for sampler in self.samplers():
+            draws = sampler.sample_without_replacement(3, exclude = np.arange(1000) % 5 // 4 * 4, count = 1000)
+            self.assertEqual(draws.shape, (1000, 3))
+            for row in draws:
+                self.assertEqual(len(set(row)), 3)
+                self.assertNotIn(2, row)
+            self.assertTrue((draws[4::5] != 4).all() and (draws[::5] != 0).all())
+            single = sampler.sample_without_replacement(4)
+            self.assertEqual(sorted(single), [0, 1, 3, 4])
+            self.assertRaises(ValueError, sampler.sample_without_replacement, 4, [0])
+
+    def test_successive_probabilities(self):
+        # first draw proportional to weights, second to the weights left
+        p = self.weights / self.weights.sum()
+        second = sum(p[i] * p[3] / (1 - p[i]) for i in [0, 1, 4])
+        for sampler in self.samplers():
+            for rounds in [3, 0]:
+                draws = sampler.sample_without_replacement(2, count = 20000, rounds = rounds)
+                self.assertAlmostEqual(np.mean(draws[:, 0] == 0), p[0], delta = 0.015)
+                self.assertAlmostEqual(np.mean(draws[:, 1] == 3), second, delta = 0.015)
+
+    def test_edge_cases(self):
+        for sampler in self.samplers():
+            self.assertEqual(sampler.sample_without_replacement(0).shape, (0,))
+            self.assertEqual(sampler.sample_without_replacement(0, count = 5).shape, (5, 0))
+            draws = sampler.sample_without_replacement(2, exclude = 0, count = 100)
+            self.assertEqual(draws.shape, (100, 2))
+            self.assertNotIn(0, draws)
+        self.assertEqual(WalkerSampler([1., 2.], list('ab')).sample_without_replacement(0, count = 3).shape, (3, 0))
+
+    def test_skewed(self):
+        # most rows run out of rounds, and must keep the item they found
+        weights = [.99, .005, .005]
+        for cls in (WalkerSampler, SimpleSampler, DynamicSampler):
+            for rounds in [1, 3]:
+                draws = cls(weights, rng = 1).sample_without_replacement(2, count = 100000, rounds = rounds)
+                self.assertTrue((draws[:, 0] != draws[:, 1]).all())
+                self.assertAlmostEqual(np.mean(draws[:, 0] != 0), .01, delta = 0.0015)
+                self.assertAlmostEqual(np.mean(draws[:, 1] == 0), .01 * .99 / .995, delta = 0.0015)
+
+class TestBatchedSampler(unittest.TestCase):
+    def test_random(self):
+        sampler = BatchedSampler([[1., 0., 3.], [0., 1.], [2.]], keys = list('abc'), rng = 0)
+        self.assertEqual(sampler.prob.shape, (3, 3))
+        ids = np.repeat([0, 1, 2], 20000)
+        draws = sampler.random(ids)
+        self.assertAlmostEqual(np.mean(draws[:20000] == 'c'), 0.75, delta = 0.01)
+        self.assertNotIn('b', draws[:20000])
+        self.assertEqual(set(draws[20000:40000]), set('b'))
+        self.assertEqual(set(draws[40000:]), set('a'))
+        self.assertEqual(sampler.random([1, 2], count = 4).shape, (2, 4))
+        self.assertFalse(hasattr(sampler, 'sample_without_replacement'))
+        self.assertEqual(len(sampler.spawn(2)), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+from .. storage import packstrings, unpackstrings
+from .. representation import IntRep, OneHotRep, OneHotOffsetRep, RandBinRep
+from .. samplers import WalkerSampler
+import unittest, shutil, tempfile, os
+import numpy as np
+
+class TestStringTable(unittest.TestCase):
+    def test_roundtrip(self):
+        for items in [['a', '', 'bc'], [u'caf\xe9', u'x'], ['nul\0inside', 'b'], []]:
+            self.assertEqual(unpackstrings(*packstrings(items)), items)
+        self.assertEqual(packstrings([u'x'])[2], 'text')
+        self.assertRaises(TypeError, packstrings, ['a', u'b'])
+        self.assertRaises(TypeError, packstrings, [('a', 1)])
+
+class TestSaveLoad(unittest.TestCase):
+    words = 'the cat sat on the mat the end'.split()
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'saved')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_intrep(self):
+        rep = IntRep(self.words)
+        rep.save(self.path)
+        for mmap in [True, False]:
+            loaded = IntRep.load(self.path, mmap)
+            self.assertEqual(loaded.idx_to_item, rep.idx_to_item)
+            self.assertEqual(loaded.counts.tolist(), rep.counts.tolist())
+            self.assertEqual(loaded['cat'], rep['cat'])
+        self.assertIsInstance(loaded.counts, np.ndarray)
+        loaded = IntRep.load(self.path)
+        self.assertIsInstance(loaded._counts, np.memmap)
+        loaded.add_many(['cat', 'dog'])
+        self.assertEqual(loaded.counts[loaded['cat']], 2)
+        self.assertEqual(IntRep.load(self.path).counts[rep['cat']], 1)
+        self.assertRaises(ValueError, OneHotRep.load, self.path)
+
+    def test_save_over_mapped(self):
+        rep = IntRep(self.words)
+        rep.save(self.path)
+        loaded = IntRep.load(self.path)
+        self.assertIsInstance(loaded._counts, np.memmap)
+        loaded.save(self.path)
+        self.assertEqual(loaded.counts.tolist(), rep.counts.tolist())
+        loaded.add_many(['dog'] * 3)
+        loaded.save(self.path)
+        self.assertEqual(IntRep.load(self.path).counts.tolist(), loaded.counts.tolist())
+
+    def test_onehot(self):
+        for rep, cls in [(OneHotRep(self.words, sparse = True), OneHotRep),
+                         (OneHotOffsetRep(2, 3, self.words), OneHotOffsetRep)]:
+            rep.save(self.path)
+            loaded = cls.load(self.path)
+            self.assertEqual(loaded.item_to_idx, rep.item_to_idx)
+            self.assertEqual(loaded.idx_to_item, rep.idx_to_item)
+            self.assertEqual(loaded.sparse, rep.sparse)
+            self.assertTrue(np.array_equal(loaded.encode_batch(self.words + ['dog']), rep.encode_batch(self.words + ['dog'])))
+            loaded.add('dog')
+            rep.add('dog')
+            self.assertEqual(loaded.item_to_idx, rep.item_to_idx)
+
+    def test_randbinrep(self):
+        rep = RandBinRep(70, self.words, p = 0.2)
+        rep.save(self.path)
+        loaded = RandBinRep.load(self.path)
+        self.assertTrue(np.array_equal(loaded.codes, rep.codes))
+        self.assertEqual(loaded.code_to_idx, rep.code_to_idx)
+        self.assertEqual(loaded.itemfrom_batch(rep.encode_batch(self.words)), self.words)
+        loaded.add_many(['dog', 'bird'])
+        self.assertEqual(len(set(c.tobytes() for c in loaded.codes)), len(loaded.idx_to_item))
+
+    def test_walker(self):
+        # each save goes over the last, which must leave no arrays behind
+        for keys in [[10, 20, 30], None, ['a', 'b', 'c'], None]:
+            sampler = WalkerSampler([1., 2., 3.], keys, rng = 0)
+            sampler.save(self.path)
+            loaded = WalkerSampler.load(self.path, rng = 0)
+            self.assertTrue(np.array_equal(loaded.prob, sampler.prob))
+            self.assertEqual(loaded.random(50).tolist(), sampler.random(50).tolist())
+            self.assertEqual(None if loaded.keys is None else loaded.keys.tolist(), keys)
+        self.assertEqual(sorted(os.listdir(self.path)), ['inx.npy', 'meta.json', 'prob.npy', 'weights.npy'])
+        self.assertIsInstance(loaded.prob, np.memmap)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+from .. tokenizer import *
+from .. representation import IntRep
+import unittest, random
+
+def example_tokenizer():
+    t = initialize_tokenizer()
+    add_to_tokenizer(t, lower_case)
+    add_to_tokenizer(t, split_ditch_char, [' '])
+    add_to_tokenizer(t, rm_dup_letters)
+    add_to_tokenizer(t, replace_and_split, [':-)', '<smileyface>'])
+    add_to_tokenizer(t, replace_and_split, [':-(', '<frownyface>'])
+    for url_part in ['http://', '.com', '.net', '.org', 'www.']:
+        add_to_tokenizer(t, replace_partial_match, [url_part, '<url>'])
+    add_to_tokenizer(t, replace_if_startswith, ['@', '<mention>'])
+    add_to_tokenizer(t, split_ditch_func, [non_alphanumeric, ['<url>', '<smileyface>', '<frownyface>', '<mention>']])
+    return t
+
+def random_strings(count, alphabet = 'aAbB01 :-)(.@\t\n', seed = 0):
+    rng = random.Random(seed)
+    return [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+            for _ in range(count)]
+
+class TestCharClass(unittest.TestCase):
+    def test_predicates(self):
+        for c in 'aZ':
+            self.assertFalse(not_letter(c))
+            self.assertTrue(alphanumeric(c))
+            self.assertTrue(not_number(c))
+        for c in '7':
+            self.assertTrue(not_letter(c))
+            self.assertFalse(not_number(c))
+            self.assertFalse(non_alphanumeric(c))
+        for c in ' _-!':
+            self.assertTrue(non_alphanumeric(c))
+        self.assertFalse(not_letter(u'\xe9'))
+        self.assertTrue(not_letter('\xe9'))
+        self.assertTrue((~not_letter)(u'\xe9'))
+
+    def test_split_matches_callable(self):
+        for f in [not_number, not_letter, alphanumeric, non_alphanumeric]:
+            g = lambda c: f(c)
+            for s in random_strings(50) + [u'Caf\xe9 d\xe9j\xe0-vu 42']:
+                self.assertEqual(split_ditch_func(s, f), split_ditch_func(s, g))
+                self.assertEqual(split_keep_func(s, f), split_keep_func(s, g))
+
+class SameTokensMixin(object):
+    def assertSameTokens(self, t, strings):
+        compiled = compile_tokenizer(t)
+        for s in strings:
+            self.assertEqual(tokenize(s, t), compiled(s))
+
+class TestCompileTokenizer(SameTokensMixin, unittest.TestCase):
+    def test_example(self):
+        s = 'HHHEEYYYY?hellllo @somebody My WONder:-(fulll, www.google.com fri:-)en:-)ds!'
+        self.assertSameTokens(example_tokenizer(), [s] + random_strings(200))
+
+    def test_every_step(self):
+        t = initialize_tokenizer()
+        add_to_tokenizer(t, split_keep_char, [':'])
+        add_to_tokenizer(t, rm_dup_letters, [1, [':']])
+        add_to_tokenizer(t, split_keep_func, [not_letter, ['@']])
+        add_to_tokenizer(t, replace_full_match, ['0', '<zero>'])
+        add_to_tokenizer(t, replace_full_match, ['1', '<zero>'])
+        add_to_tokenizer(t, replace_if_endswith, ['b', '<b>'])
+        add_to_tokenizer(t, split_ditch_func, [lambda c: c == '.'])
+        add_to_tokenizer(t, lambda s: s[::-1])
+        add_to_tokenizer(t, split_keep_func, [lambda c: c in 'A-'])
+        self.assertSameTokens(t, random_strings(200))
+
+    def test_empty(self):
+        self.assertSameTokens(initialize_tokenizer(), random_strings(20))
+
+    def test_noop_step(self):
+        t = initialize_tokenizer()
+        add_to_tokenizer(t, rm_dup_letters, [-1])
+        self.assertEqual(compile_tokenizer(t)('aab  ccc\tx'), ['aab  ccc\tx'])
+        self.assertSameTokens(t, random_strings(20))
+
+class TestProtectedTokens(SameTokensMixin, unittest.TestCase):
+    def test_registry(self):
+        t = initialize_tokenizer(protected = ['a:b'])
+        add_to_tokenizer(t, split_keep_char, [':'])
+        add_to_tokenizer(t, rm_dup_letters, [1, ['bb:']])
+        add_to_tokenizer(t, split_ditch_func, [non_alphanumeric])
+        protect(t, ['xx.yy'])
+        docs = ['a:b', 'xx.yy', 'aa:bb', 'bb:', 'xx.yy:a:b']
+        self.assertEqual([tokenize(doc, t) for doc in docs],
+                         [['a:b'], ['xx.yy'], ['a', 'b'], ['b'], ['xx.yy', 'a', 'b']])
+        self.assertSameTokens(t, docs + random_strings(100))
+        self.assertEqual(list(tokenize_many(docs, t, workers = 2)), [tokenize(doc, t) for doc in docs])
+
+class TestTokenizeMany(unittest.TestCase):
+    def test_matches_tokenize(self):
+        t = example_tokenizer()
+        docs = random_strings(100)
+        expected = [tokenize(doc, t) for doc in docs]
+        self.assertEqual(list(tokenize_many(docs, t)), expected)
+        self.assertEqual(list(tokenize_many(iter(docs), t, workers = 2, chunksize = 7)), expected)
+
+class TestBigramPoset(unittest.TestCase):
+    def test_pairs(self):
+        tokens = ['c', 'a', 'b', 'a', 'd', 'c']
+        pairs = [['a', 'b'], ['a', 'c'], ['a', 'd'], ['b', 'c'], ['b', 'd'], ['c', 'd']]
+        self.assertEqual(make_bigram_poset(tokens), pairs)
+        self.assertEqual(list(make_bigram_poset(tokens, lazy = True)), [tuple(p) for p in pairs])
+        self.assertEqual(make_bigram_poset(tokens, max_pairs = 4), pairs[:4])
+        self.assertEqual(make_bigram_poset(['a', 'a']), [])
+
+    def test_intrep(self):
+        tokens = ['c', 'a', 'b', 'a', 'd', 'c']
+        intrep = IntRep(['d', 'c', 'b', 'a'])
+        ids = make_bigram_poset(tokens, intrep = intrep)
+        self.assertEqual(ids.dtype, np.int32)
+        self.assertEqual(ids.tolist(), [[1, 2], [1, 3], [1, 4], [2, 3], [2, 4], [3, 4]])
+        self.assertEqual(sorted(sorted(intrep.inv(i) for i in pair) for pair in ids.tolist()), make_bigram_poset(tokens))
+        self.assertEqual(make_bigram_poset(tokens, max_pairs = 4, intrep = intrep).tolist(), ids[:4].tolist())
+        self.assertEqual(make_bigram_poset(['a'], intrep = intrep).shape, (0, 2))
+        oov = make_bigram_poset(['x', 'y', 'a', 'z'], intrep = IntRep(['a', 'b']))
+        self.assertEqual(oov.tolist(), [[0, 1]])
+        for kwargs in [{}, {'intrep': intrep}]:
+            self.assertRaises(ValueError, make_bigram_poset, tokens, max_pairs = -1, **kwargs)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+from .. wordembeddings import ColWesEmbedding, Embedding
+from .. representation import IntRep
+from .. wordembeddings.similarity import cosinetopk, HyperplaneLSH
+import unittest, os, gzip, shutil, struct, tempfile
+import numpy as np
+
+TEXT = '''the 0.5 -1.0 2.0
+cat 1.5 0.25 -0.5
+*UNKNOWN* 0.0 0.0 1.0
+
+'''
+
+class TestColWesEmbedding(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'emb.txt')
+        self.cache = os.path.join(self.dir, 'cache')
+        with open(self.path, 'wb') as f:
+            f.write(TEXT)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_convert(self):
+        emb = ColWesEmbedding(self.path, self.cache)
+        self.assertEqual(sorted(os.listdir(self.dir)), ['cache', 'emb.txt'])
+        self.assertEqual(sorted(os.path.splitext(name)[1] for name in os.listdir(self.cache)), ['.npy', '.source', '.vocab'])
+        self.assertEqual(emb.matrix.dtype, np.float32)
+        self.assertEqual(emb.matrix.shape, (3, 3))
+        self.assertTrue(np.array_equal(emb['cat'], [1.5, 0.25, -0.5]))
+        self.assertTrue(np.array_equal(emb['dog'], emb['*UNKNOWN*']))
+        self.assertTrue(np.array_equal(emb['<UNK>'], [0., 0., 1.]))
+        self.assertEqual(sorted(emb.emdict), ['<UNK>', 'cat', 'the'])
+
+    def test_memmap(self):
+        ColWesEmbedding(self.path, self.cache)
+        emb = ColWesEmbedding(self.path, self.cache)
+        self.assertIsInstance(emb.matrix, np.memmap)
+        self.assertTrue(np.array_equal(emb['the'], [0.5, -1.0, 2.0]))
+        self.assertTrue(np.shares_memory(emb['the'], emb.matrix))
+        self.assertTrue(np.array_equal(emb.encode_batch(['cat', 'x']), [[1.5, 0.25, -0.5], [0., 0., 1.]]))
+
+    def test_stale(self):
+        ColWesEmbedding(self.path, self.cache)
+        with open(self.path, 'wb') as f:
+            f.write(TEXT.replace('cat 1.5', 'cat 15.5'))
+        emb = ColWesEmbedding(self.path, self.cache)
+        self.assertTrue(np.array_equal(emb['cat'], [15.5, 0.25, -0.5]))
+        self.assertIsInstance(ColWesEmbedding(self.path, self.cache).matrix, np.memmap)
+
+    def test_default_cache(self):
+        environ = dict(os.environ)
+        os.environ['DATAUTILS_CACHE'] = self.cache
+        try:
+            self.assertNotIsInstance(ColWesEmbedding(self.path).matrix, np.memmap)
+            self.assertIsInstance(ColWesEmbedding(self.path).matrix, np.memmap)
+        finally:
+            os.environ.clear()
+            os.environ.update(environ)
+        self.assertEqual(len(os.listdir(self.cache)), 3)
+        emb = ColWesEmbedding(self.path, cachedir = False)
+        self.assertNotIsInstance(emb.matrix, np.memmap)
+        self.assertEqual(sorted(os.listdir(self.dir)), ['cache', 'emb.txt'])
+
+    def test_lookup_batch(self):
+        emb = ColWesEmbedding(self.path, self.cache)
+        tokens = ['cat', 'x', 'the', '<UNK>']
+        batch = emb.lookup_batch(tokens)
+        self.assertEqual(batch.shape, (4, 3))
+        for row, token in zip(batch, tokens):
+            self.assertTrue(np.array_equal(row, emb[token]))
+        ir = IntRep(['the', 'bird', 'cat'])
+        matrix = emb.matrix_for(ir)
+        self.assertEqual(matrix.shape, (ir.dim, 3))
+        for i in range(ir.dim):
+            self.assertTrue(np.array_equal(matrix[i], emb[ir.idx_to_item[i]]))
+
+    def test_most_similar(self):
+        emb = ColWesEmbedding(self.path, self.cache)
+        self.assertEqual([w for w, s in emb.most_similar('the')], ['*UNKNOWN*', 'cat'])
+        self.assertEqual(emb.most_similar(np.array([1., 0., 0.]), k = 1)[0][0], 'cat')
+
+class TestEmbedding(unittest.TestCase):
+    words = ['the', 'cat', 'sat', 'the']
+    matrix = np.arange(12, dtype = np.float32).reshape(4, 3) / 4
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, name, data, opener = open):
+        path = os.path.join(self.dir, name)
+        f = opener(path, 'wb')
+        f.write(data)
+        f.close()
+        return path
+
+    def text(self, header):
+        lines = ['%s %s' % (w, ' '.join(map(repr, map(float, row)))) for w, row in zip(self.words, self.matrix)]
+        return '\n'.join(['4 3'] * header + lines) + '\n'
+
+    def check(self, emb, vocab = ('the', 'cat', 'sat')):
+        self.assertEqual(emb.idx_to_item, list(vocab) + ['<UNK>'])
+        self.assertEqual(emb.matrix.dtype, np.float32)
+        for word in vocab:
+            self.assertTrue(np.array_equal(emb[word], self.matrix[self.words.index(word)]))
+        self.assertTrue(np.array_equal(emb['dog'], np.zeros(3)))
+
+    def test_text(self):
+        self.check(Embedding.load(self.write('glove.txt', self.text(False))))
+        self.check(Embedding.load(self.write('w2v.txt', self.text(True))))
+        self.check(Embedding.load(self.write('glove.txt.gz', self.text(False), gzip.open)))
+        emb = Embedding.load(self.write('spaces.txt', 'x 0.0 0.0\na cat 1.0 2.0\n'))
+        self.assertTrue(np.array_equal(emb['a cat'], [1., 2.]))
+
+    def test_word2vec(self):
+        data = '4 3\n' + ''.join('%s %s\n' % (w, struct.pack('<3f', *row)) for w, row in zip(self.words, self.matrix))
+        self.check(Embedding.load(self.write('w2v.bin', data), 'word2vec'))
+        emb = Embedding.load(self.write('w2v.bin', data), 'word2vec', vocab = IntRep(['sat']))
+        self.check(emb, ['sat'])
+        self.assertEqual(emb.matrix.shape, (2, 3))
+
+    def test_vocab_progress(self):
+        calls = []
+        path = self.write('glove.txt', self.text(False))
+        emb = Embedding.load(path, vocab = set(['sat', 'the', 'dog']), unknown = None, progress = lambda *a: calls.append(a))
+        self.assertEqual(emb.idx_to_item, ['the', 'sat'])
+        self.assertRaises(KeyError, emb.__getitem__, 'dog')
+        self.assertEqual(calls[-1], (4, 4))
+        self.assertEqual(emb.indices(iter(['sat', 'the'])).tolist(), [1, 0])
+        with self.assertRaises(KeyError) as cm:
+            emb.indices(token for token in ['the', 'dog'])
+        self.assertEqual(cm.exception.args, ('dog',))
+
+    def test_save_load(self):
+        emb = Embedding.load(self.write('glove.txt', self.text(False)))
+        emb.save(os.path.join(self.dir, 'emb'))
+        loaded = Embedding.load(os.path.join(self.dir, 'emb'), 'binary')
+        self.assertIsInstance(loaded.matrix, np.memmap)
+        self.check(loaded)
+
+class TestSimilarity(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.matrix = rng.randn(2000, 20).astype(np.float32)
+        self.queries = self.matrix[:50] + 0.1 * rng.randn(50, 20).astype(np.float32)
+
+    def brute(self, queries, k):
+        unit = self.matrix / np.linalg.norm(self.matrix, axis = 1)[:, None]
+        sims = np.dot(queries / np.linalg.norm(queries, axis = 1)[:, None], unit.T)
+        return np.argsort(-sims, axis = 1, kind = 'mergesort')[:, :k]
+
+    def test_cosinetopk(self):
+        idx, sims = cosinetopk(self.queries, self.matrix, k = 5, blocksize = 300)
+        self.assertTrue(np.array_equal(idx, self.brute(self.queries, 5)))
+        self.assertTrue((np.diff(sims, axis = 1) <= 0).all())
+
+    def test_lsh_recall(self):
+        index = HyperplaneLSH(self.matrix, nbits = 10, ntables = 4, seed = 1)
+        exact = self.brute(self.queries, 1)[:, 0]
+        recall = (index.query(self.queries, k = 1)[0][:, 0] == exact).mean()
+        probed = (index.query(self.queries, k = 1, probes = 3)[0][:, 0] == exact).mean()
+        self.assertGreater(recall, 0.8)
+        self.assertGreaterEqual(probed, recall)
+
+    def test_lsh_save_load(self):
+        index = HyperplaneLSH(self.matrix, nbits = 8, ntables = 2, seed = 1)
+        path = tempfile.mktemp(suffix = '.npz')
+        try:
+            index.save(path)
+            loaded = HyperplaneLSH.load(path, self.matrix)
+        finally:
+            os.remove(path)
+        for a, b in zip(index.query(self.queries, 3), loaded.query(self.queries, 3)):
+            self.assertTrue(np.array_equal(a, b))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -27,67 +27,107 @@
 #	composable functions for tokenizing strings	
 #---------------------------------------#
 
-from collections import defaultdict
+import re
+import multiprocessing
+from collections import deque
+from itertools import combinations, islice
+from operator import methodcaller
+import numpy as np
 
-ORD_Z = ord('z')
-ORD_A = ord('a')
-ORD_0 = ord('0')
-ORD_9 = ord('9')
+class CharClass(object):
+	"""A character predicate backed by a regular expression character class.
 
-## Docs
-#  for this fun
-def not_number(c):
-	"""Return True if c is not a number
-	
-	:param c: to test
-	:type c: chr
-	:rtype: bool
+	Calling it tests a single character like any other predicate, but
+	split_ditch_func and split_keep_func recognise it and split a whole string
+	with one regex scan instead of one call per character. Unicode strings are
+	matched with unicode semantics, byte strings with ascii semantics.
 	"""
-	c = ord(c)
-	if c > ORD_9 or c < ORD_0:
-		return True
-	return False
+	def __init__(self, chars, negate = False):
+		"""
+		:param chars: the body of a regex character class, e.g. r'\\d'
+		:param negate: if True, the predicate is True for characters not in chars
+		:type chars: string
+		:type negate: bool
+		"""
+		self.chars = chars
+		self.negate = negate
+		true, false = '[%s]' % chars, '[^%s]' % chars
+		if negate:
+			true, false = false, true
+		self._text = [re.compile(p, re.UNICODE) for p in (true, false + '+', '%s+|%s' % (false, true))]
+		self._bytes = [re.compile(p.encode('ascii')) for p in (true, false + '+', '%s+|%s' % (false, true))]
 
-def not_letter(c):
-	"""Return True if c is not a letter.
-	
-	:param c: to test
-	:type c: chr
-	:rtype: bool
-	"""	
-	c = ord(c)
-	if c > ORD_Z or c < ORD_A:
-		return True
-	return False
-
-def alphanumeric(c):
-	"""Return True if c is an aphanumeric character.
-	
-	:param c: to test
-	:type c: chr
-	:rtype: bool
-	"""
-	if not_number(c) and not_letter(c):
-		return False
-	return True
+	def _patterns(self, s):
+		return self._bytes if isinstance(s, bytes) else self._text
 
-def non_alphanumeric(c):
-	"""Return True if c is not an alphanumeric character.
-	
-	:param c: to test
-	:type c: chr
-	:rtype: bool
+	def __call__(self, c):
+		return self._patterns(c)[0].match(c) is not None
+
+	def __invert__(self):
+		return CharClass(self.chars, not self.negate)
+
+	def __repr__(self):
+		return 'CharClass(%r, negate = %r)' % (self.chars, self.negate)
+
+	def split_ditch(self, s):
+		"""Return the runs of characters in s the predicate is False for.
+
+		:type s: string
+		:rtype: list of strings
+		"""
+		return self._patterns(s)[1].findall(s)
+
+	def split_keep(self, s):
+		"""Return the runs of characters in s the predicate is False for, with each
+		character it is True for as a token of its own.
+
+		:type s: string
+		:rtype: list of strings
+		"""
+		return self._patterns(s)[2].findall(s)
+
+#: True if c is not a number
+not_number = CharClass(r'\d', negate = True)
+
+#: True if c is not a letter
+not_letter = CharClass(r'\W\d_')
+
+#: True if c is a letter or a number
+alphanumeric = CharClass(r'\W_', negate = True)
+
+#: True if c is neither a letter nor a number
+non_alphanumeric = CharClass(r'\W_')
+
+class Tokenizer(list):
+	"""A list of (function, arguments) tuples with a registry of protected tokens.
+
+	Every step of the tokenizer taking an ignore argument (rm_dup_letters and the
+	split functions) leaves the protected tokens alone, in addition to anything
+	in its own ignore argument. The registry is a set, so checking a substring
+	against it costs the same no matter how many tokens are protected.
 	"""
-	if alphanumeric(c):
-		return False
-	return True
+	def __init__(self, steps = (), protected = ()):
+		list.__init__(self, steps)
+		self.protected = set(protected)
 
-def initialize_tokenizer():
+def initialize_tokenizer(protected = None):
 	"""Intitial and empty tokenizer. (hint: it is just an empty list)
 	
-	:rtype: list
+	:param protected: tokens no step should modify, e.g. placeholders like '<url>'
+	:type protected: iterable of strings
+	:rtype: Tokenizer
 	"""
-	return []
+	return Tokenizer(protected = protected or ())
+
+def protect(t, tokens):
+	"""Add tokens to the protected tokens of a tokenizer.
+
+	:param tokens: tokens no step should modify
+	:type t: Tokenizer
+	:type tokens: iterable of strings
+	:rtype: None
+	"""
+	t.protected.update(tokens)
 
 def add_to_tokenizer(t, f, args = None):
 	"""Add a function call and arguments to a series of function calls.
@@ -113,8 +153,12 @@ def tokenize(s, funcs):
 
 	:rtype: list of strings
 	"""
+	protected = getattr(funcs, 'protected', None)
 	for f, args in funcs:
-		if args is None:
+		if protected and f in _PROTECTABLE:
+			args, kwargs = _add_protected(_call_args(args), protected, _EitherLookup)
+			s = f(s, *args, **kwargs)
+		elif args is None:
 			s = f(s)
 		elif type(args) is list:
 				s = f(s, *args)
@@ -135,7 +179,7 @@ def lower_case(s):
 		s = [s]
 	return [sub.lower() for sub in s]
 
-def rm_dup_letters(s, n = 2, ignore = []):
+def rm_dup_letters(s, n = 2, ignore = ()):
 	"""Replace any consecutive character occurrence of length greater than n with n occurrences.
 	
 	:param s: to have letters removed
@@ -146,23 +190,13 @@ def rm_dup_letters(s, n = 2, ignore = []):
 	"""
 	if not type(s) is list:
 		s = [s]
-	result = []
-	for substring in s:
-		if substring in ignore:
-			result.append(substring)
-		else:
-			temp = substring[:n]
-			for c in substring[n:]:
-				dup = 0
-				for i in range(1, n + 1):
-					if c == temp[-i]:
-						dup += 1
-				if dup != n:
-					temp += c
-			result.append(temp)
-	return result
+	if n < 0:
+		return list(s)
+	ignore = _as_lookup(ignore)
+	shorten = _rm_dup_func(n)
+	return [substring if substring in ignore else shorten(substring) for substring in s]
 
-def split_ditch_char(s, c, ignore = []):
+def split_ditch_char(s, c, ignore = ()):
 	"""Return a list where each string is split on c, with c removed. 
 	
 	:param s: to be split
@@ -175,6 +209,7 @@ def split_ditch_char(s, c, ignore = []):
 	"""
 	if not type(s) is list:
 		s = [s]
+	ignore = _as_lookup(ignore)
 	result = []
 	for substring in s:
 		if substring in ignore:
@@ -185,37 +220,33 @@ def split_ditch_char(s, c, ignore = []):
 				result.append(split)
 	return result
 
-def split_ditch_func(s, f, ignore = []):
+def split_ditch_func(s, f, ignore = ()):
 	"""Return a list where each string is split if f(c) returns True for each c in s. c is removed.
 
 	:param s: to be split
-	:param f: should take a chr and return a bool
+	:param f: should take a chr and return a bool, a CharClass splits in one scan
 	:param ignore: substrings to ignore
 	:type s: string or list of strings
-	:type f: function
+	:type f: function or CharClass
 	:type ignore: list of strings
 	:rtype: list of strings
 	"""
 	result = []
 	if not type(s) is list:
 		s = [s]
+	if isinstance(f, CharClass):
+		split = f.split_ditch
+	else:
+		split = lambda substring: _split_on_func(substring, f, False)
+	ignore = _as_lookup(ignore)
 	for substring in s:
 		if substring in ignore:
 			result.append(substring)
 		else:
-			stack = ''
-			for c in substring:
-				if f(c):
-					if len(stack) > 0:
-						result.append(stack)
-						stack = ''
-				else:
-					stack += c
-			if len(stack) > 0:
-				result.append(stack)
+			result.extend(split(substring))
 	return result
 
-def split_keep_char(s, c, ignore = []):
+def split_keep_char(s, c, ignore = ()):
 	"""Return a list where each string is split on c, c is kept as a token of length 1. 
 
 	:param s: to be split
@@ -229,48 +260,38 @@ def split_keep_char(s, c, ignore = []):
 	result = []
 	if not type(s) is list:
 		s = [s]
+	ignore = _as_lookup(ignore)
 	for substring in s:
 		if substring in ignore:
 			result.append(substring)
 		else:
-			rest = substring
-			while len(rest) > 0:
-				splits = rest.partition(c)
-				result.append(splits[0])
-				if len(splits[1]) > 0: 
-					result.append(splits[1])
-				rest = splits[2] 
+			result.extend(_interleave(substring.split(c), c))
 	return result
 
-def split_keep_func(s, f, ignore = []):
+def split_keep_func(s, f, ignore = ()):
 	"""Return a list where each string is split if f(c) returns True for each c in s. c is kept as a token.
 
 	:param s: to be split
-	:param f: should take a chr and return a bool
+	:param f: should take a chr and return a bool, a CharClass splits in one scan
 	:param ignore: substrings to ignore
 	:type s: string or list of strings
-	:type f: function
+	:type f: function or CharClass
 	:type ignore: list of strings
 	:rtype: list of strings
 	"""
 	result = []
 	if not type(s) is list:
 		s = [s]
+	if isinstance(f, CharClass):
+		split = f.split_keep
+	else:
+		split = lambda substring: _split_on_func(substring, f, True)
+	ignore = _as_lookup(ignore)
 	for substring in s:
 		if substring in ignore:
 			result.append(substring)
 		else:
-			stack = ''
-			for c in substring:
-				if f(c):
-					if len(stack) > 0:
-						result.append(stack)
-						stack = ''
-					result.append(c)
-				else:
-					stack += c
-			if len(stack) > 0:
-				result.append(stack)
+			result.extend(split(substring))
 	return result
 
 def replace_full_match(s, token, replacement):
@@ -286,7 +307,7 @@ def replace_full_match(s, token, replacement):
 	"""
 	if not type(s) is list:
 		s = [s]
-	return [replacement if substring is token else substring for substring in s]
+	return [replacement if substring == token else substring for substring in s]
 
 def replace_partial_match(s, token, replacement):
 	"""Replace a substring in s with replacement if token **is in** substring.
@@ -318,13 +339,7 @@ def replace_and_split(s, token, replacement):
 	if not type(s) is list:
 		s = [s]
 	for substring in s:
-		rest = substring
-		while len(rest) > 0:
-			splits = rest.partition(token)
-			result.append(splits[0])
-			if len(splits[1]) > 0: 
-				result.append(replacement)
-			rest = splits[2]
+		result.extend(_interleave(substring.split(token), replacement))
 	return result
 
 def replace_if_startswith(s, token, replacement):
@@ -357,23 +372,359 @@ def replace_if_endswith(s, token, replacement):
 		s = [s]
 	return [replacement if substring.endswith(token) else substring for substring in s]
 
-def make_bigram_poset(tokens):
-	"""strict order"""
-	d = defaultdict(set)
-	for t1 in tokens:
-		for t2 in tokens:
-			if t1 != t2:
-				if t1 < t2:
-					d[t1].add(t2)
-				else:
-					d[t2].add(t1)
-					
-	poset = [[parent,child] for parent, children in d.items() for child in children]
-	return poset
+def make_bigram_poset(tokens, lazy = False, max_pairs = None, intrep = None):
+	"""Return every pair of distinct tokens in strict order, as [smaller, larger].
+
+	tokens is deduplicated and sorted first, so the work done is proportional to
+	the number of distinct pairs rather than to the square of len(tokens).
+
+	:param tokens: to be paired
+	:param lazy: if True, return a generator of (smaller, larger) tuples
+	:param max_pairs: the most pairs to return
+	:param intrep: if given, encode the tokens with intrep first and return the pairs of distinct indices, in strict index order, as an (n, 2) int32 array; unknown tokens all share index 0
+	:type tokens: list of strings
+	:type lazy: bool
+	:type max_pairs: int
+	:type intrep: representation.IntRep
+	:rtype: list of lists, generator of tuples or numpy array
+	"""
+	if max_pairs is not None and max_pairs < 0:
+		raise ValueError('max_pairs must be None or non-negative')
+	if intrep is not None:
+		# unknown tokens are all 0, so deduplicate after encoding
+		idx = np.unique(intrep.encode(tokens))
+		n = len(idx)
+		m = n * (n - 1) // 2
+		if max_pairs is not None:
+			m = min(m, max_pairs)
+		i, j = _pair_indices(n, m)
+		return np.column_stack((idx[i], idx[j]))
+	unique = sorted(set(tokens))
+	pairs = combinations(unique, 2)
+	if max_pairs is not None:
+		pairs = islice(pairs, max_pairs)
+	if lazy:
+		return pairs
+	return [list(pair) for pair in pairs]
+
+def _pair_indices(n, m):
+	"""Return the first m pairs (i, j), i < j < n, in lexicographic order as two arrays."""
+	ends = np.cumsum(np.arange(n - 1, 0, -1))
+	k = np.arange(m)
+	i = ends.searchsorted(k, side = 'right')
+	j = k - ends[i] + n
+	return i, j
+
+def compile_tokenizer(t):
+	"""Compile the function calls in t into a single fused tokenizing function.
+
+	The returned function gives the same result as ``tokenize(s, t)``. Steps built
+	from the functions in this module are rewritten as per token operations backed
+	by precompiled regular expressions, consecutive replacements are merged, and
+	runs of per token operations are fused so that only one intermediate list is
+	built per splitting step. Any other function is called as is on the full list.
+	The protected tokens of t are read once, when t is compiled.
+
+	:param t: to be compiled
+	:type t: list of (function, arguments) tuples
+	:rtype: function
+	"""
+	protected = frozenset(getattr(t, 'protected', ()))
+	ops = []
+	maps = []
+	for f, args in _merge_replacements([(f, _call_args(args)) for f, args in t]):
+		compiler = _COMPILERS.get(f)
+		kwargs = {}
+		if protected and f in _PROTECTABLE:
+			args, kwargs = _add_protected(args, protected, frozenset.union)
+		if compiler is None:
+			if maps:
+				ops.append((_MAP, _compose(maps)))
+				maps = []
+			ops.append((_CALL, f, args, kwargs))
+			continue
+		kind, fn = compiler(*args, **kwargs)
+		if kind is _MAP:
+			maps.append(fn)
+		elif maps:
+			ops.append((_FLATMAP, _compose(maps), fn))
+			maps = []
+		else:
+			ops.append((_FLAT, fn))
+	if maps:
+		ops.append((_MAP, _compose(maps)))
+
+	def compiled_tokenize(s):
+		for op in ops:
+			kind = op[0]
+			if kind is _CALL:
+				s = op[1](s, *op[2], **op[3])
+				continue
+			if not type(s) is list:
+				s = [s]
+			if kind is _FLAT:
+				split = op[1]
+				s = [x for sub in s for x in split(sub)]
+			elif kind is _FLATMAP:
+				f, split = op[1], op[2]
+				s = [x for sub in s for x in split(f(sub))]
+			else:
+				f = op[1]
+				s = [f(sub) for sub in s]
+		return [x for x in s if x and x != '\t' and x != '\n']
+	return compiled_tokenize
+
+def tokenize_many(docs, funcs, workers = 1, chunksize = 256):
+	"""Tokenize every document in docs, yielding the token lists in input order.
+
+	docs is consumed lazily, chunksize documents at a time, and at most two chunks
+	per worker are in flight, so memory use does not grow with the number of
+	documents. With more than one worker the chunks are tokenized in a process
+	pool, so funcs must be picklable (module level functions, not lambdas).
+
+	:param docs: to be tokenized, e.g. a file object (lines are passed as is)
+	:param funcs: to be called to tokenize each document
+	:param workers: processes to use, None for one per cpu
+	:param chunksize: documents sent to a worker at a time
+
+	:type docs: iterable of strings
+	:type funcs: list of (function, arguments) tuples
+	:type workers: int
+	:type chunksize: int
+
+	:rtype: generator of lists of strings
+	"""
+	if workers is None:
+		workers = multiprocessing.cpu_count()
+	if workers <= 1:
+		compiled = compile_tokenizer(funcs)
+		for doc in docs:
+			yield compiled(doc)
+		return
+	docs = iter(docs)
+	pool = multiprocessing.Pool(workers, _init_worker, (funcs,))
+	try:
+		pending = deque()
+		chunk = list(islice(docs, chunksize))
+		while chunk:
+			if len(pending) == 2 * workers:
+				for tokens in pending.popleft().get():
+					yield tokens
+			pending.append(pool.apply_async(_tokenize_chunk, (chunk,)))
+			chunk = list(islice(docs, chunksize))
+		while pending:
+			for tokens in pending.popleft().get():
+				yield tokens
+	finally:
+		pool.terminate()
+
+# the compiled tokenizer of a tokenize_many worker process
+_worker_tokenize = None
+
+def _init_worker(funcs):
+	global _worker_tokenize
+	_worker_tokenize = compile_tokenizer(funcs)
+
+def _tokenize_chunk(chunk):
+	return [_worker_tokenize(doc) for doc in chunk]
+
+# stage kinds used by compile_tokenizer
+_CALL, _MAP, _FLAT, _FLATMAP = 'call', 'map', 'flat', 'flatmap'
+
+def _call_args(args):
+	"""Return args as the positional arguments tokenize would pass."""
+	if args is None:
+		return ()
+	elif type(args) is list:
+		return tuple(args)
+	return (args,)
+
+def _merge_replacements(steps):
+	"""Merge consecutive replacements sharing a replacement into one step.
+
+	Once a substring has been replaced, a following replacement with the same
+	replacement string can only map it to itself, so the tokens can be matched
+	together.
+	"""
+	merged = []
+	for f, args in steps:
+		if f in _REPLACEMENTS and len(args) == 2:
+			token, replacement = args
+			if merged and merged[-1][0] is f and merged[-1][1][1] == replacement:
+				token = merged.pop()[1][0] + (token,)
+			else:
+				token = (token,)
+			args = (token, replacement)
+		merged.append((f, args))
+	return merged
+
+def _compose(fs):
+	if len(fs) == 1:
+		return fs[0]
+	def composed(sub):
+		for f in fs:
+			sub = f(sub)
+		return sub
+	return composed
+
+def _as_lookup(ignore):
+	"""Return an ignore list or tuple as a hashed collection, if its items allow it."""
+	if not isinstance(ignore, (list, tuple)):
+		return ignore
+	try:
+		return frozenset(ignore)
+	except TypeError:
+		return ignore
+
+class _EitherLookup(object):
+	"""Membership in either of two collections, without copying either."""
+	__slots__ = ('first', 'second')
+
+	def __init__(self, first, second):
+		self.first = first
+		self.second = _as_lookup(second)
+
+	def __contains__(self, x):
+		return x in self.first or x in self.second
+
+def _add_protected(args, protected, merge):
+	"""Return the arguments and keyword arguments of a step in _PROTECTABLE, with
+	protected merged into its ignore argument by merge(protected, ignore)."""
+	if len(args) > 1:
+		if args[1]:
+			return args[:1] + (merge(protected, args[1]),) + args[2:], {}
+		return args[:1] + (protected,) + args[2:], {}
+	return args, {'ignore': protected}
+
+def _protect_map(f, ignore):
+	if not ignore:
+		return f
+	ignore = _as_lookup(ignore)
+	return lambda sub: sub if sub in ignore else f(sub)
+
+def _protect_split(split, ignore):
+	if not ignore:
+		return split
+	ignore = _as_lookup(ignore)
+	return lambda sub: [sub] if sub in ignore else split(sub)
+
+def _interleave(pieces, sep):
+	"""Join pieces with sep as a list, dropping a trailing empty piece.
+
+	This is what repeatedly partitioning a string on sep produces.
+	"""
+	result = [sep] * (2 * len(pieces) - 1)
+	result[::2] = pieces
+	if not pieces[-1]:
+		result.pop()
+	return result
+
+def _split_on_func(substring, f, keep):
+	"""Split substring wherever f(c) is True, keeping c as a token if keep."""
+	result = []
+	start = 0
+	for i, c in enumerate(substring):
+		if f(c):
+			if i > start:
+				result.append(substring[start:i])
+			if keep:
+				result.append(c)
+			start = i + 1
+	if start < len(substring):
+		result.append(substring[start:])
+	return result
+
+def _rm_dup_func(n):
+	"""Return a function shortening runs of a repeated character to n characters."""
+	pattern = re.compile(r'(.)\1{%d,}' % n, re.DOTALL)
+	search, sub = pattern.search, pattern.sub
+	shorten = lambda match: match.group()[:n]
+	return lambda substring: sub(shorten, substring) if search(substring) else substring
+
+def _replace_split_func(token, replacement):
+	"""Return a function splitting a string at token, with token replaced."""
+	def replace_split(substring):
+		if token in substring:
+			return _interleave(substring.split(token), replacement)
+		return [substring] if substring else []
+	return replace_split
+
+def _compile_lower_case():
+	return _MAP, methodcaller('lower')
+
+def _identity(sub):
+	return sub
+
+def _compile_rm_dup_letters(n = 2, ignore = ()):
+	if n < 0:
+		# still a per token step, so the input string becomes a one token list
+		return _MAP, _identity
+	return _MAP, _protect_map(_rm_dup_func(n), ignore)
+
+def _compile_split_ditch_char(c, ignore = ()):
+	return _FLAT, _protect_split(methodcaller('split', c), ignore)
+
+def _compile_split_ditch_func(f, ignore = ()):
+	if isinstance(f, CharClass):
+		split = f.split_ditch
+	else:
+		split = lambda sub: _split_on_func(sub, f, False)
+	return _FLAT, _protect_split(split, ignore)
+
+def _compile_split_keep_char(c, ignore = ()):
+	return _FLAT, _protect_split(lambda sub: _interleave(sub.split(c), c), ignore)
+
+def _compile_split_keep_func(f, ignore = ()):
+	if isinstance(f, CharClass):
+		split = f.split_keep
+	else:
+		split = lambda sub: _split_on_func(sub, f, True)
+	return _FLAT, _protect_split(split, ignore)
+
+def _compile_replace_and_split(token, replacement):
+	return _FLAT, _replace_split_func(token, replacement)
+
+def _compile_replace_full_match(tokens, replacement):
+	tokens = frozenset(tokens)
+	return _MAP, lambda sub: replacement if sub in tokens else sub
+
+def _compile_replace_partial_match(tokens, replacement):
+	if len(tokens) == 1:
+		token = tokens[0]
+		return _MAP, lambda sub: replacement if token in sub else sub
+	search = re.compile('|'.join(map(re.escape, tokens))).search
+	return _MAP, lambda sub: replacement if search(sub) else sub
+
+def _compile_replace_if_startswith(tokens, replacement):
+	return _MAP, lambda sub: replacement if sub.startswith(tokens) else sub
+
+def _compile_replace_if_endswith(tokens, replacement):
+	return _MAP, lambda sub: replacement if sub.endswith(tokens) else sub
+
+# steps taking ignore as their second argument
+_PROTECTABLE = frozenset([rm_dup_letters, split_ditch_char, split_ditch_func,
+	split_keep_char, split_keep_func])
+
+_REPLACEMENTS = frozenset([replace_full_match, replace_partial_match,
+	replace_if_startswith, replace_if_endswith])
+
+_COMPILERS = {
+	lower_case: _compile_lower_case,
+	rm_dup_letters: _compile_rm_dup_letters,
+	split_ditch_char: _compile_split_ditch_char,
+	split_ditch_func: _compile_split_ditch_func,
+	split_keep_char: _compile_split_keep_char,
+	split_keep_func: _compile_split_keep_func,
+	replace_and_split: _compile_replace_and_split,
+	replace_full_match: _compile_replace_full_match,
+	replace_partial_match: _compile_replace_partial_match,
+	replace_if_startswith: _compile_replace_if_startswith,
+	replace_if_endswith: _compile_replace_if_endswith,
+}
 
 if __name__ == '__main__':
 	s = 'HHHEEYYYY?hellllo @somebody My WONder:-(fulll, www.google.com fri:-)en:-)ds!'
-	t = initialize_tokenizer()
+	t = initialize_tokenizer(protected = ['<url>', '<smileyface>', '<frownyface>', '<mention>'])
 	add_to_tokenizer(t, lower_case)
 	add_to_tokenizer(t, split_ditch_char, [' '])
 	add_to_tokenizer(t, rm_dup_letters)
@@ -382,8 +733,9 @@ if __name__ == '__main__':
 	for url_part in ['http://', '.com', '.net', '.org', 'www.']:
 		add_to_tokenizer(t, replace_partial_match, [url_part, '<url>'])
 	add_to_tokenizer(t, replace_if_startswith, ['@', '<mention>'])
-	add_to_tokenizer(t, split_ditch_func, [non_alphanumeric, ['<url>', '<smileyface>', '<frownyface>', '<mention>']])
+	add_to_tokenizer(t, split_ditch_func, [non_alphanumeric])
 	tokens = tokenize(s, t)
+	assert tokens == compile_tokenizer(t)(s)
 	print sorted(tokens)
 	print len(tokens)
 	bitokens = sorted(make_bigram_poset(tokens))
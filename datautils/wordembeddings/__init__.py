@@ -1,2 +1,4 @@
 """... automodule::"""
+from embedding import Embedding
 from cwembedding import ColWesEmbedding
+from similarity import cosinetopk, HyperplaneLSH
@@ -1,18 +1,76 @@
-import pkgutil
-import numpy as np
+import os, pkgutil, hashlib, tempfile
+from StringIO import StringIO
+from embedding import Embedding, readtext, savebinary, loadbinary
 
-class ColWesEmbedding(object):
-    def __init__(self):
-        data = pkgutil.get_data('datautils', 'data/cw-50-dim-scaled.txt')
-        splines = [line.split(' ') for line in data.split('\n')]
-        emdict = dict([(line[0], np.array(map(float, line[1:])))
-                       for line in splines])
-        self.unknown = emdict['<UNK>'] = emdict['*UNKNOWN*']
-        del emdict['*UNKNOWN*']
-        self.emdict = emdict
+DATA = 'data/cw-50-dim-scaled.txt'
 
-    def __getitem__(self, key):
-        try:
-            return self.emdict[key]
-        except KeyError:
-            return self.unknown
+def defaultcachedir():
+    """Return $DATAUTILS_CACHE, or datautils under $XDG_CACHE_HOME or ~/.cache."""
+    if os.environ.get('DATAUTILS_CACHE'):
+        return os.environ['DATAUTILS_CACHE']
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'datautils')
+
+def sourcestamp(path):
+    """Return a string of the size and modification time of path."""
+    st = os.stat(path)
+    return '%d %r' % (st.st_size, st.st_mtime)
+
+def loadcached(path, cachedir = None):
+    """Return the words and matrix of the text embeddings at path, memory
+    mapped from a binary copy in cachedir if its recorded source size and
+    modification time still match path, otherwise parsed and saved there.
+    cachedir defaults to defaultcachedir(); with False nothing is cached."""
+    if cachedir is False:
+        with open(path, 'rb') as f:
+            return readtext(f)
+    if cachedir is None:
+        cachedir = defaultcachedir()
+    stamp = sourcestamp(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    prefix = os.path.join(cachedir, '%s-%s' % (name, hashlib.md5(os.path.abspath(path)).hexdigest()[:12]))
+    try:
+        with open(prefix + '.source', 'rb') as f:
+            if f.read() == stamp:
+                return loadbinary(prefix)
+    except (IOError, OSError, ValueError):
+        pass
+    with open(path, 'rb') as f:
+        words, matrix = readtext(f)
+    try:
+        if not os.path.isdir(cachedir):
+            os.makedirs(cachedir)
+        savebinary(prefix, words, matrix)
+        # the stamp goes last, so it never vouches for files still being written
+        fd, tmp = tempfile.mkstemp(dir = cachedir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(stamp)
+        os.rename(tmp, prefix + '.source')
+    except (IOError, OSError):
+        pass
+    return words, matrix
+
+class ColWesEmbedding(Embedding):
+    """Collobert & Weston word embeddings.
+
+    The text data is converted once to a float32 .npy matrix and a .vocab file
+    in cachedir (see loadcached), which later instances memory map, so
+    construction is fast and processes share the matrix through the page
+    cache. The conversion is redone when the text file changes, and if it
+    can't be saved the parsed matrix is kept in memory. Unknown words, and
+    '<UNK>', map to the *UNKNOWN* row.
+    """
+    def __init__(self, path = None, cachedir = None):
+        if path is None:
+            path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), DATA)
+        if os.path.exists(path):
+            words, matrix = loadcached(path, cachedir)
+        else:
+            words, matrix = readtext(StringIO(pkgutil.get_data('datautils', DATA)))
+        Embedding.__init__(self, words, matrix, '*UNKNOWN*')
+        self.item_to_idx['<UNK>'] = self.unkidx
+
+    @property
+    def emdict(self):
+        """Mapping from word to embedding, as row views of matrix."""
+        return dict((word, self.matrix[i]) for word, i in self.item_to_idx.iteritems() if word != '*UNKNOWN*')
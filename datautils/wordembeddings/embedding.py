@@ -0,0 +1,257 @@
+import os, gzip, tempfile
+import numpy as np
+from similarity import normalize, cosinetopk, HyperplaneLSH
+
+def openfile(path):
+    """Open path for binary reading, through gzip if it ends with .gz."""
+    return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+
+def countlines(f, chunksize = 1 << 20):
+    """Return the number of lines left in f, then seek back to where f was."""
+    start = f.tell()
+    count, last = 0, '\n'
+    for chunk in iter(lambda: f.read(chunksize), ''):
+        count += chunk.count('\n')
+        last = chunk[-1]
+    f.seek(start)
+    return count + (last != '\n')
+
+class _Rows(object):
+    """Fill the rows of a preallocated float32 matrix while loading, keeping
+    only the first occurrence of words in vocab and calling progress."""
+    def __init__(self, count, dim, vocab, unknown, progress, every):
+        if vocab is not None:
+            count = min(count, len(vocab))
+        self.matrix = np.empty((count + 1, dim), dtype = np.float32)
+        self.words, self.seen = [], set()
+        self.vocab, self.unknown = vocab, unknown
+        self.progress, self.every = progress, every
+        self.total, self.read = count, 0
+
+    def next(self, word):
+        """Return the row to fill for word, or None to skip it."""
+        self.read += 1
+        if self.progress is not None and self.read % self.every == 0:
+            self.progress(self.read, self.total)
+        if word in self.seen or (self.vocab is not None and word not in self.vocab and word != self.unknown):
+            return None
+        if len(self.words) == len(self.matrix):
+            self.matrix.resize((2 * len(self.matrix), self.matrix.shape[1]), refcheck = False)
+        self.seen.add(word)
+        self.words.append(word)
+        return self.matrix[len(self.words) - 1]
+
+    def finish(self):
+        """Append a zero row for unknown if it wasn't read, and shrink the
+        matrix to the rows used, in place."""
+        if self.unknown is not None and self.unknown not in self.seen:
+            if len(self.words) == len(self.matrix):
+                self.matrix.resize((len(self.matrix) + 1, self.matrix.shape[1]), refcheck = False)
+            self.matrix[len(self.words)] = 0
+            self.words.append(self.unknown)
+        if self.progress is not None:
+            self.progress(self.read, self.read)
+        self.matrix.resize((len(self.words), self.matrix.shape[1]), refcheck = False)
+        return self.words, self.matrix
+
+def readtext(f, vocab = None, unknown = None, progress = None, every = 100000):
+    """Read embeddings from a text file, one 'word v1 ... vd' line per word.
+
+    A first line holding only the word count and dimension, as written by
+    word2vec, is read as a header; without one (GloVe) the lines are counted
+    first. Lines are parsed one at a time into a preallocated float32 matrix,
+    so peak memory stays close to the size of the result. Only words in vocab
+    are kept if it is given, and the matrix is allocated for at most
+    len(vocab) rows. If unknown isn't in the file a zero row is added for it.
+    progress(read, total) is called every every lines. Returns the words and
+    the matrix.
+    """
+    first = f.readline()
+    parts = first.split()
+    if len(parts) == 2 and parts[0].isdigit() and parts[1].isdigit():
+        count, dim = int(parts[0]), int(parts[1])
+        first = None
+    else:
+        count, dim = countlines(f) + 1, len(parts) - 1
+    rows = _Rows(count, dim, vocab, unknown, progress, every)
+    lines = f if first is None else _chain(first, f)
+    for line in lines:
+        line = line.rstrip()
+        if not line:
+            continue
+        word, _, rest = line.partition(' ')
+        values = np.fromstring(rest, dtype = np.float32, sep = ' ')
+        if len(values) != dim:
+            # words containing spaces, as in some GloVe files
+            parts = line.rsplit(' ', dim)
+            word, values = parts[0], parts[1:]
+        row = rows.next(word)
+        if row is not None:
+            row[:] = values
+    return rows.finish()
+
+def _chain(first, f):
+    yield first
+    for line in f:
+        yield line
+
+def readword2vec(f, vocab = None, unknown = None, progress = None, every = 100000, chunksize = 1 << 20):
+    """Read embeddings from a word2vec binary file, as readtext does for text.
+
+    The file is a 'count dim' header line followed, for each word, by the word,
+    a space and dim little-endian float32 values. It is read in chunks of
+    chunksize bytes.
+    """
+    count, dim = map(int, f.readline().split())
+    rows = _Rows(count, dim, vocab, unknown, progress, every)
+    nbytes = 4 * dim
+    buf, pos = '', 0
+    for _ in range(count):
+        while True:
+            end = buf.find(' ', pos)
+            if end >= 0 and len(buf) - end > nbytes:
+                break
+            chunk = f.read(chunksize)
+            if not chunk:
+                raise ValueError('unexpected end of word2vec file')
+            buf, pos = buf[pos:] + chunk, 0
+        row = rows.next(buf[pos:end].lstrip('\n'))
+        if row is not None:
+            row[:] = np.frombuffer(buf, dtype = '<f4', count = dim, offset = end + 1)
+        pos = end + 1 + nbytes
+    return rows.finish()
+
+def savebinary(prefix, words, matrix):
+    """Write matrix to prefix.npy and words, one per line, to prefix.vocab.
+
+    Each file is written to a temporary name first and then renamed, so
+    processes converting at the same time never see a partial file.
+    """
+    dirname = os.path.dirname(prefix) or '.'
+    for ext, write in [('.vocab', lambda f: f.write('\n'.join(words))),
+                       ('.npy', lambda f: np.save(f, matrix))]:
+        fd, tmp = tempfile.mkstemp(dir = dirname)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.rename(tmp, prefix + ext)
+        except:
+            os.remove(tmp)
+            raise
+
+def loadbinary(prefix):
+    """Return the vocab list and read-only memory-mapped matrix saved at prefix."""
+    with open(prefix + '.vocab', 'rb') as f:
+        words = f.read().split('\n')
+    return words, np.load(prefix + '.npy', mmap_mode = 'r')
+
+READERS = {'text': readtext, 'glove': readtext, 'word2vec': readword2vec}
+
+class Embedding(object):
+    """Word embeddings, a matrix with a row per word of idx_to_item.
+
+    Lookups return views of rows of matrix. Words not in the vocabulary map to
+    the row of unknown, and raise KeyError if unknown is None.
+    """
+    def __init__(self, words, matrix, unknown = '<UNK>'):
+        self.matrix = matrix
+        self.idx_to_item = words
+        self.item_to_idx = dict((word, i) for i, word in enumerate(words))
+        self.unkidx = self.item_to_idx.get(unknown)
+        self.unknown = None if self.unkidx is None else matrix[self.unkidx]
+        self._unit = None
+
+    @classmethod
+    def load(cls, path, format = 'text', vocab = None, unknown = '<UNK>', progress = None):
+        """Load embeddings from path, in format 'text' (or 'glove'), 'word2vec'
+        for the binary format, or 'binary' for the memory mapped files written
+        by save, path then being their common prefix. vocab, unknown and
+        progress are as for readtext; vocab is ignored for 'binary'.
+        """
+        if format == 'binary':
+            words, matrix = loadbinary(path)
+        else:
+            with openfile(path) as f:
+                words, matrix = READERS[format](f, vocab, unknown, progress)
+        return cls(words, matrix, unknown)
+
+    def save(self, prefix):
+        """Save to prefix.npy and prefix.vocab, to be loaded with format 'binary'."""
+        savebinary(prefix, self.idx_to_item, self.matrix)
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1]
+
+    def __len__(self):
+        return len(self.idx_to_item)
+
+    def __contains__(self, key):
+        return key in self.item_to_idx
+
+    def __getitem__(self, key):
+        idx = self.item_to_idx.get(key, self.unkidx)
+        if idx is None:
+            raise KeyError(key)
+        return self.matrix[idx]
+
+    def indices(self, tokens):
+        """Return the int array of matrix rows of tokens, unknown ones mapping to
+        the unknown row."""
+        get, unk = self.item_to_idx.get, self.unkidx
+        if unk is None:
+            # tokens may be an iterator, and are needed again to name a missing one
+            tokens = list(tokens)
+            idx = np.fromiter((get(token, -1) for token in tokens), dtype = np.intp)
+            if (idx < 0).any():
+                raise KeyError(tokens[np.flatnonzero(idx < 0)[0]])
+            return idx
+        return np.fromiter((get(token, unk) for token in tokens), dtype = np.intp)
+
+    def lookup_batch(self, tokens, out = None):
+        """Return the (len(tokens), dim) embeddings of tokens in one gather."""
+        return np.take(self.matrix, self.indices(tokens), axis = 0, out = out)
+
+    def matrix_for(self, intrep):
+        """Return a (intrep.dim, dim) matrix whose row i embeds intrep.idx_to_item[i],
+        e.g. to initialize an embedding layer over an IntRep vocabulary."""
+        return self.lookup_batch(intrep.idx_to_item)
+
+    def encode_batch(self, keys, out = None, dtype = np.float32):
+        rows = self.indices(keys)
+        if out is None:
+            out = np.empty((len(rows), self.dim), dtype = dtype)
+        out[...] = self.matrix[rows]
+        return out
+
+    @property
+    def unit(self):
+        """matrix with rows scaled to unit length, computed on first use."""
+        if self._unit is None:
+            self._unit = normalize(self.matrix)
+        return self._unit
+
+    def lshindex(self, nbits = 16, ntables = 8, seed = None):
+        """Return a HyperplaneLSH index over the embeddings."""
+        return HyperplaneLSH(self.unit, nbits, ntables, seed)
+
+    def nearest(self, vectors, k = 1, index = None, probes = 0):
+        """Return the rows nearest each of vectors in cosine similarity, as
+        (len(vectors), k) index and similarity arrays; exactly, or approximately
+        through a HyperplaneLSH index."""
+        if index is None:
+            return cosinetopk(vectors, self.unit, k, normalized = True)
+        return index.query(vectors, k, probes)
+
+    def most_similar(self, key, k = 10, index = None, probes = 0):
+        """Return the k (word, similarity) pairs most similar to key, a word or
+        a vector, excluding the word itself."""
+        if isinstance(key, np.ndarray):
+            row, vector = -1, key
+        else:
+            row = self.item_to_idx.get(key, self.unkidx)
+            if row is None:
+                raise KeyError(key)
+            vector = self.matrix[row]
+        idx, sims = self.nearest(vector, k + 1, index, probes)
+        return [(self.idx_to_item[i], float(s)) for i, s in zip(idx[0], sims[0]) if i != row and i >= 0][:k]
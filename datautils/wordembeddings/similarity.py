@@ -0,0 +1,120 @@
+"""Cosine similarity search over the rows of an embedding matrix."""
+import numpy as np
+from .. representation import packcodes
+
+def normalize(matrix, dtype = np.float32):
+    """Return the rows of matrix scaled to unit length; zero rows stay zero."""
+    matrix = np.asarray(matrix, dtype = dtype)
+    norms = np.sqrt(np.einsum('ij,ij->i', matrix, matrix))
+    norms[norms == 0] = 1
+    return matrix / norms[:, None]
+
+def _toprows(sims, idx, k):
+    """Keep the k largest entries of each row of sims, with their idx, sorted
+    by decreasing similarity and then increasing index."""
+    if k < sims.shape[1]:
+        part = np.argpartition(-sims, k - 1, axis = 1)[:, :k]
+        sims, idx = np.take_along_axis(sims, part, 1), np.take_along_axis(idx, part, 1)
+    order = np.lexsort((idx, -sims), axis = 1)
+    return np.take_along_axis(idx, order, 1), np.take_along_axis(sims, order, 1)
+
+def cosinetopk(queries, matrix, k = 10, blocksize = 1 << 16, normalized = False):
+    """Return the k rows of matrix most cosine similar to each row of queries.
+
+    matrix is multiplied in blocks of blocksize rows, keeping a running top k,
+    so memory stays bounded for large vocabularies. Pass normalized = True if
+    the rows of matrix already have unit length. Returns indices and
+    similarities as two (len(queries), k) arrays, most similar first.
+    """
+    queries = normalize(np.atleast_2d(queries))
+    k = min(k, len(matrix))
+    idx = np.zeros((len(queries), 0), dtype = np.intp)
+    sims = np.zeros((len(queries), 0), dtype = np.float32)
+    for start in range(0, len(matrix), blocksize):
+        block = matrix[start:start + blocksize]
+        if not normalized:
+            block = normalize(block)
+        blockidx = np.arange(start, start + len(block))
+        idx, sims = _toprows(np.hstack([sims, np.dot(queries, block.T)]),
+                             np.hstack([idx, np.broadcast_to(blockidx, (len(queries), len(block)))]), k)
+    return idx, sims
+
+class HyperplaneLSH(object):
+    """Approximate cosine nearest neighbour index by random hyperplane hashing.
+
+    Each of ntables tables hashes a row to the signs of its projections on
+    nbits random hyperplanes, packed as by RandBinRep codes, and keeps the rows
+    sorted by hash so a bucket is a range found by binary search. Candidates
+    from the query's buckets are re-ranked by exact cosine similarity. More
+    tables, fewer bits or more probes raise recall at the cost of latency.
+    """
+    def __init__(self, matrix, nbits = 16, ntables = 8, seed = None, planes = None):
+        if not 0 < nbits <= 64:
+            raise ValueError('nbits must be between 1 and 64')
+        self.matrix = normalize(matrix)
+        if planes is None:
+            planes = np.random.RandomState(seed).randn(ntables, nbits, self.matrix.shape[1])
+        self.planes = np.asarray(planes, dtype = np.float32)
+        self.ntables, self.nbits = self.planes.shape[:2]
+        self.order = np.empty((self.ntables, len(self.matrix)), dtype = np.intp)
+        self.keys = np.empty((self.ntables, len(self.matrix)), dtype = np.uint64)
+        for t in range(self.ntables):
+            keys = self.hash(self.matrix, t)[0]
+            self.order[t] = np.argsort(keys, kind = 'mergesort')
+            self.keys[t] = keys[self.order[t]]
+
+    def hash(self, vectors, t):
+        """Return the keys of vectors in table t, and their projections."""
+        proj = np.dot(vectors, self.planes[t].T)
+        return packcodes(proj > 0)[:, 0], proj
+
+    def candidates(self, queries, probes = 0):
+        """Return, for each row of queries, the array of rows sharing a bucket
+        with it in some table. Each table also probes the probes buckets found
+        by flipping the query's least certain hash bits, one at a time."""
+        found = [[] for _ in range(len(queries))]
+        for t in range(self.ntables):
+            keys, proj = self.hash(queries, t)
+            allkeys = [keys]
+            if probes:
+                bits = proj > 0
+                for j in np.argsort(np.abs(proj), axis = 1)[:, :probes].T:
+                    flipped = bits.copy()
+                    flipped[np.arange(len(bits)), j] ^= True
+                    allkeys.append(packcodes(flipped)[:, 0])
+            for keys in allkeys:
+                lo = np.searchsorted(self.keys[t], keys, 'left')
+                hi = np.searchsorted(self.keys[t], keys, 'right')
+                for i in np.flatnonzero(hi > lo):
+                    found[i].append(self.order[t, lo[i]:hi[i]])
+        return [np.unique(np.concatenate(f)) if f else np.zeros(0, dtype = np.intp) for f in found]
+
+    def query(self, queries, k = 10, probes = 0):
+        """Return approximate cosine top k rows for each row of queries, as
+        cosinetopk does. Queries with fewer than k candidates are padded with
+        index -1 and similarity -inf."""
+        queries = normalize(np.atleast_2d(queries))
+        idx = np.full((len(queries), k), -1, dtype = np.intp)
+        sims = np.full((len(queries), k), -np.inf, dtype = np.float32)
+        for i, cand in enumerate(self.candidates(queries, probes)):
+            if len(cand):
+                best, sim = _toprows(np.dot(self.matrix[cand], queries[i])[None, :], cand[None, :], k)
+                idx[i, :best.shape[1]], sims[i, :best.shape[1]] = best[0], sim[0]
+        return idx, sims
+
+    def save(self, path):
+        """Save the index, without the matrix, to the .npz file path."""
+        np.savez(path, planes = self.planes, order = self.order, keys = self.keys,
+                 shape = np.array(self.matrix.shape))
+
+    @classmethod
+    def load(cls, path, matrix):
+        """Load an index saved by save, over the same matrix it was built from."""
+        data = np.load(path)
+        if tuple(data['shape']) != np.shape(matrix):
+            raise ValueError('index was built for a %s matrix' % (tuple(data['shape']),))
+        index = cls.__new__(cls)
+        index.matrix = normalize(matrix)
+        index.planes, index.order, index.keys = data['planes'], data['order'], data['keys']
+        index.ntables, index.nbits = index.planes.shape[:2]
+        return index